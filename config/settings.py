@@ -42,7 +42,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'polls.middleware.StaticFilesMiddleware',
+    'polls.middleware.RequestClockMiddleware',
+    'polls.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -53,12 +57,18 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'polls.instrumentation.TimedDjangoTemplates',  # DjangoTemplates, timing renders per request
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory in production, re-read from disk while debugging.
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -81,6 +91,91 @@ DATABASES = {
                       ),
 }
 
+# Keep connections open between requests instead of reconnecting for every one, checking them before reuse.
+DATABASES['default']['CONN_MAX_AGE'] = config('DATABASE_CONN_MAX_AGE', default=600, cast=int)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# An optional read replica (polls/routers.py). Reads go to it unless the request or the client wrote within the last
+# POLLS_REPLICA_LAG seconds, which should exceed the replica's worst replication delay.
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = db_url(DATABASE_REPLICA_URL)
+    DATABASES['replica'].update(CONN_MAX_AGE=DATABASES['default']['CONN_MAX_AGE'], CONN_HEALTH_CHECKS=True,
+                                TEST={'MIRROR': 'default'})
+    DATABASE_ROUTERS = ['polls.routers.ReplicaRouter']
+
+POLLS_REPLICA = {
+    'ALIAS': 'replica' if DATABASE_REPLICA_URL else None,
+    'LAG': config('POLLS_REPLICA_LAG', default=5.0, cast=float),
+}
+
+# Applied to every SQLite connection (polls/database.py): readers no longer block the writer, writers wait up to
+# busy_timeout milliseconds for the lock, and commits are synced to disk at checkpoints only.
+POLLS_SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+}
+
+# Vote transactions that lose a lock race are retried up to ATTEMPTS times, waiting about BACKOFF * 2**n seconds
+# but no more than MAX_DELAY.
+POLLS_LOCK_RETRY = {
+    'ATTEMPTS': config('POLLS_LOCK_RETRY_ATTEMPTS', default=5, cast=int),
+    'BACKOFF': config('POLLS_LOCK_RETRY_BACKOFF', default=0.02, cast=float),
+    'MAX_DELAY': config('POLLS_LOCK_RETRY_MAX_DELAY', default=1.0, cast=float),
+}
+
+# Token bucket rate limits of the endpoints that write, per client (the user, or the IP address of anonymous
+# visitors) and endpoint, see polls/throttling.py. Each endpoint allows bursts of BURST requests, refilled at RATE
+# ('<count>/<second|minute|hour|day>'). Buckets are kept in the CACHE cache, which must increment atomically:
+# local-memory, memcached or redis. Behind a reverse proxy, set IP_HEADER to the header it passes the client's
+# address in, e.g. X-Forwarded-For.
+POLLS_RATE_LIMITS = {
+    'ENABLED': config('POLLS_RATE_LIMITS', default=True, cast=bool),
+    'CACHE': config('POLLS_RATE_LIMIT_CACHE', default='default'),
+    'IP_HEADER': config('POLLS_RATE_LIMIT_IP_HEADER', default=''),
+    'ENDPOINTS': {
+        'vote': {
+            'RATE': config('POLLS_RATE_LIMIT_VOTE', default='30/minute'),
+            'BURST': config('POLLS_RATE_LIMIT_VOTE_BURST', default=10, cast=int),
+        },
+        'signup': {
+            'RATE': config('POLLS_RATE_LIMIT_SIGNUP', default='10/hour'),
+            'BURST': config('POLLS_RATE_LIMIT_SIGNUP_BURST', default=5, cast=int),
+        },
+    },
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Local-memory by default, set CACHE_BACKEND to django.core.cache.backends.filebased.FileBasedCache
+# and CACHE_LOCATION to a directory to share the cache between worker processes.
+# `versions` holds the per-poll version tokens (polls/versions.py) keying cached pages and API ETags, and the token
+# of the cached index listing (polls/listing.py). Every worker must see every other worker's tokens, so it has to
+# be shared as soon as WEB_CONCURRENCY is above 1.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='ku-polls'),
+    },
+    'versions': {
+        'BACKEND': config('VERSION_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('VERSION_CACHE_LOCATION', default='ku-polls-versions'),
+    },
+}
+
+# Worker processes serving the app, read from WEB_CONCURRENCY like gunicorn and uvicorn do.
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=1, cast=int)
+
+# Sessions
+# https://docs.djangoproject.com/en/3.2/topics/http/sessions/#configuring-the-session-engine
+# cached_db serves sessions from the cache and only falls back to the database on a miss. Set SESSION_ENGINE to
+# django.contrib.sessions.backends.signed_cookies to keep sessions out of the server entirely. Anonymous visitors
+# without a session cookie never touch the session store.
+
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -106,6 +201,61 @@ AUTHENTICATION_BACKENDS = [
 
 LOGIN_REDIRECT_URL = '/polls/'
 
+# Polls
+
+POLLS_INDEX_PAGE_SIZE = config('POLLS_INDEX_PAGE_SIZE', default=20, cast=int)
+
+# Closed polls' results pages: seconds the rendered page stays in the server cache, and the max-age sent to browsers.
+POLLS_CLOSED_RESULTS_CACHE_TIMEOUT = config('POLLS_CLOSED_RESULTS_CACHE_TIMEOUT', default=24 * 60 * 60, cast=int)
+POLLS_CLOSED_RESULTS_MAX_AGE = config('POLLS_CLOSED_RESULTS_MAX_AGE', default=60 * 60, cast=int)
+
+# Seconds a poll must have been closed before its results are frozen into a snapshot, leaving queued votes cast
+# just before the close time to be written.
+POLLS_RESULT_SNAPSHOT_DELAY = config('POLLS_RESULT_SNAPSHOT_DELAY', default=60, cast=int)
+
+# Counter rows per choice. Above one, concurrent votes for a choice update different rows instead of queueing on
+# one, and results are read from the counters through a cache that keeps them for the given number of seconds.
+POLLS_VOTE_COUNTER_SHARDS = config('POLLS_VOTE_COUNTER_SHARDS', default=1, cast=int)
+POLLS_VOTE_COUNTER_CACHE_TIMEOUT = config('POLLS_VOTE_COUNTER_CACHE_TIMEOUT', default=2, cast=int)
+
+# Most polls a single request to the JSON results API (polls/api.py) may ask for.
+POLLS_API_MAX_BATCH = config('POLLS_API_MAX_BATCH', default=100, cast=int)
+
+# Route the index, results and vote pages to the native async views in polls/async_views.py, for ASGI servers.
+POLLS_ASYNC_VIEWS = config('POLLS_ASYNC_VIEWS', default=False, cast=bool)
+
+# Live results streams (Server-Sent Events), only served with POLLS_ASYNC_VIEWS: at most one update per INTERVAL
+# seconds, a keep-alive comment after HEARTBEAT quiet seconds, and the stream ends after MAX_AGE seconds so the
+# browser reconnects to a fresh one.
+POLLS_RESULTS_STREAM = {
+    'INTERVAL': config('POLLS_RESULTS_STREAM_INTERVAL', default=1.0, cast=float),
+    'HEARTBEAT': config('POLLS_RESULTS_STREAM_HEARTBEAT', default=15.0, cast=float),
+    'MAX_AGE': config('POLLS_RESULTS_STREAM_MAX_AGE', default=300.0, cast=float),
+}
+
+# 'direct' writes each vote in its own transaction, 'queued' hands votes to the write-behind queue (polls/ingest.py).
+POLLS_VOTE_INGESTION = config('POLLS_VOTE_INGESTION', default='direct')
+
+# Each process journals to JOURNAL with its process id added, and takes over the journals of processes that are gone.
+POLLS_VOTE_QUEUE = {
+    'FLUSH_INTERVAL': config('POLLS_VOTE_QUEUE_FLUSH_INTERVAL', default=0.5, cast=float),  # Seconds
+    'BATCH_SIZE': config('POLLS_VOTE_QUEUE_BATCH_SIZE', default=500, cast=int),
+    'DURABILITY': config('POLLS_VOTE_QUEUE_DURABILITY', default='journal'),  # 'memory', 'journal' or 'fsync'
+    'JOURNAL': config('POLLS_VOTE_QUEUE_JOURNAL', default=str(BASE_DIR / 'vote-queue.jsonl')),
+}
+
+# Per-view request metrics (polls/instrumentation.py): Server-Timing headers, p50/p95/p99 over the latest WINDOW
+# requests of each view dumped as JSON to DUMP_FILE every DUMP_INTERVAL seconds, and the Prometheus text format
+# served at /polls/metrics/ when METRICS_ENDPOINT is on.
+POLLS_INSTRUMENTATION = {
+    'ENABLED': config('POLLS_INSTRUMENTATION', default=True, cast=bool),
+    'SERVER_TIMING': config('POLLS_INSTRUMENTATION_SERVER_TIMING', default=DEBUG, cast=bool),
+    'WINDOW': config('POLLS_INSTRUMENTATION_WINDOW', default=1000, cast=int),
+    'DUMP_FILE': config('POLLS_INSTRUMENTATION_DUMP_FILE', default=''),
+    'DUMP_INTERVAL': config('POLLS_INSTRUMENTATION_DUMP_INTERVAL', default=60.0, cast=float),
+    'METRICS_ENDPOINT': config('POLLS_INSTRUMENTATION_METRICS_ENDPOINT', default=False, cast=bool),
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -123,6 +273,21 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+
+# `collectstatic` names each file after a hash of its content and writes gzip (and, when the brotli package is
+# installed, brotli) variants of the text files next to them, see polls/staticfiles.py.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'polls.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
+# Serve the collected files from the app itself. Hashed names are cached by browsers for a year as immutable, other
+# files for MAX_AGE seconds. Off while debugging, when runserver serves the apps' static directories instead.
+POLLS_STATIC = {
+    'SERVE': config('POLLS_SERVE_STATIC', default=not DEBUG, cast=bool),
+    'MAX_AGE': config('POLLS_STATIC_MAX_AGE', default=60, cast=int),
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -1,18 +1,19 @@
-from django.contrib.auth import authenticate, login
+from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 from django.shortcuts import redirect, render
+from polls.throttling import rate_limit
 
 
+@rate_limit('signup', by_ip=True)
 def signup(request):
     """Register a new user."""
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
         if form.is_valid():
-            form.save()
-            username = form.cleaned_data.get('username')
-            raw_passwd = form.cleaned_data.get('password')
-            user = authenticate(username=username,password=raw_passwd)
-            login(request, user)
+            # The form has just hashed the password, log the new user in directly rather than hashing it again
+            # through authenticate().
+            user = form.save()
+            login(request, user, backend='django.contrib.auth.backends.ModelBackend')
             return redirect('login')
         # what if form is not valid?
         # we should display a message in signup.html
@@ -0,0 +1,139 @@
+"""
+Read-only JSON API of the poll listing, results and vote history, for dashboards.
+
+Results come from the maintained vote counters, any number of polls in two queries, and a poll's votes over time
+from its minute or hour rollups, in time proportional to the number of buckets. Responses carry an
+ETag built from the polls' version tokens and statuses, so a client polling for changes gets a `304 Not Modified`
+without the choices being read, and are gzip-compressed when the client accepts it.
+"""
+
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+from . import clock
+from .listing import get_poll_page
+from .models import Choice, Question, VoteRollup
+from .versions import vote_versions
+
+
+def _etag(*parts):
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def _conditional(request, etag, payload):
+    """Answer with a 304 if the client holds `etag`, else with the JSON of `payload()`, tagged with `etag`."""
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+    response = JsonResponse(payload())
+    response['ETag'] = etag
+    return response
+
+
+def _poll(question, now):
+    return {'id': question.id, 'text': question.text, 'status': question.status(now),
+            'start_date': question.start_date, 'end_date': question.end_date}
+
+
+@require_safe
+@gzip_page
+def poll_list(request):
+    """One page of the index listing, filtered by `status` and continued from `cursor` like the index page."""
+    now = clock.now()
+    polls, next_cursor = get_poll_page(request.GET.get('status', ''), request.GET.get('cursor', ''), now)
+    payload = {'polls': [_poll(question, now) for question in polls], 'next_cursor': next_cursor}
+    return _conditional(request, _etag(payload), lambda: payload)
+
+
+def _results(request, questions):
+    """Respond with the results of `questions`, reading their choices only if the client's copy is stale."""
+    now = clock.now()
+    versions = vote_versions([question.id for question in questions])
+    etag = _etag([(question.id, versions[question.id], question.status(now)) for question in questions])
+
+    def payload():
+        polls = {question.id: {**_poll(question, now), 'version': versions[question.id], 'total_votes': 0,
+                               'choices': []}
+                 for question in questions}
+        choices = Choice.objects.filter(question_id__in=polls).with_vote_total().order_by('pk').values_list(
+            'question_id', 'id', 'text', 'vote_total')
+        for question_id, pk, text, votes in choices:
+            polls[question_id]['choices'].append({'id': pk, 'text': text, 'votes': votes})
+            polls[question_id]['total_votes'] += votes
+        return {'polls': list(polls.values())}
+
+    return _conditional(request, etag, payload)
+
+
+@require_safe
+@gzip_page
+def poll_results(request, pk):
+    """The results of one poll."""
+    question = Question.objects.filter(pk=pk).first()
+    if question is None:
+        return JsonResponse({'error': "No poll found matching the query."}, status=404)
+    return _results(request, [question])
+
+
+@require_safe
+@gzip_page
+def results_batch(request):
+    """
+    The results of the polls listed in `ids`, e.g. `?ids=1,2,3`, at most `POLLS_API_MAX_BATCH` of them.
+
+    Polls come back in the order asked for, unknown ids are left out.
+    """
+    try:
+        question_ids = list(dict.fromkeys(int(pk) for pk in request.GET.get('ids', '').split(',') if pk))
+    except ValueError:
+        return JsonResponse({'error': "ids must be a comma-separated list of poll ids."}, status=400)
+    if not question_ids or len(question_ids) > settings.POLLS_API_MAX_BATCH:
+        return JsonResponse({'error': f"Give between 1 and {settings.POLLS_API_MAX_BATCH} poll ids."}, status=400)
+    questions = Question.objects.in_bulk(question_ids)
+    return _results(request, [questions[pk] for pk in question_ids if pk in questions])
+
+
+def _moment(value):
+    """Parse an ISO 8601 date and time, in UTC unless it gives its offset, raising ValueError if it is not one."""
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(value)
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment, datetime.timezone.utc)
+
+
+@require_safe
+@gzip_page
+def poll_votes(request, pk):
+    """
+    A poll's votes per `period`, `hour` (the default) or `minute`, optionally from `since` and until `until`.
+
+    Each bucket that saw votes lists its start, the poll's first-time votes in it and the net change of each
+    choice's tally, keyed by choice id. A changed vote moves one between choices and adds nothing to `votes`.
+    """
+    question = Question.objects.filter(pk=pk).first()
+    if question is None:
+        return JsonResponse({'error': "No poll found matching the query."}, status=404)
+    period = request.GET.get('period', VoteRollup.HOUR)
+    if period not in VoteRollup.PERIODS:
+        return JsonResponse({'error': f"period must be one of {', '.join(VoteRollup.PERIODS)}."}, status=400)
+    try:
+        since, until = (_moment(request.GET[name]) if request.GET.get(name) else None for name in ('since', 'until'))
+    except ValueError:
+        return JsonResponse({'error': "since and until must be ISO 8601 dates and times."}, status=400)
+    etag = _etag(question.id, vote_versions([question.id])[question.id], period, since, until)
+
+    def payload():
+        choices = question.choice_set.order_by('pk').values('id', 'text')
+        buckets = [{'start': bucket, 'votes': sum(changes.values()), 'choices': changes}
+                   for bucket, changes in VoteRollup.series(question.id, period, since, until)]
+        return {'id': question.id, 'period': period, 'choices': list(choices), 'buckets': buckets}
+
+    return _conditional(request, etag, payload)
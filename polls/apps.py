@@ -8,3 +8,7 @@ class PollsConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        """Connect the app's signal receivers and register its system checks."""
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,148 @@
+"""
+Native async versions of KU Poll's read and vote views.
+
+They are routed instead of the views in `polls.views` when `POLLS_ASYNC_VIEWS` is set, and are meant to be served
+by an ASGI server (see config/asgi.py) so that a request waiting on the database does not hold a worker thread.
+"""
+
+import asyncio
+import functools
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import prefetch_related_objects
+from django.http import Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from .listing import aget_poll_page
+from .models import Choice, Question
+from .pubsub import broker, format_event, stream_message
+from .throttling import rate_limit
+from .versions import aedit_version, avote_version, reads_for
+from .views import closed_results_headers, closed_results_key, closed_results_validators, results_context
+from .voting import VotingClosed, cast_vote, queue_vote
+
+
+async def resolve_user(request):
+    """Load the lazy `request.user` in a thread, so templates can read it later without touching the database."""
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def alogin_required(view):
+    """Async version of `django.contrib.auth.decorators.login_required`, sending anonymous visitors to log in."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await resolve_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def index(request, error_message=''):
+    """Async version of `polls.views.index`."""
+    status = request.GET.get('status', '')
+    latest_poll_list, next_cursor = await aget_poll_page(status, request.GET.get('cursor', ''))
+    await resolve_user(request)
+    context = {'latest_poll_list': latest_poll_list, 'next_cursor': next_cursor, 'status': status,
+               "error_message": error_message}
+    return render(request, 'polls/index.html', context)
+
+
+async def results(request, pk):
+    """
+    Async version of `polls.views.ResultsView`.
+
+    The page is rendered in a thread, where the tally is only computed if the cached fragment is missing, and
+    closed polls are served from the full-page cache with the same validators.
+    """
+    try:
+        question = await Question.objects.aget(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404("No question found matching the query")
+    version = await avote_version(question.id)
+    context = {'question': question, 'object': question, **results_context(question, version), 'live_results': True}
+    render_page = sync_to_async(render)
+    if question.status() != Question.CLOSED:
+        return await render_page(request, 'polls/results.html', context)
+
+    etag, last_modified = closed_results_validators(question, version)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        key = closed_results_key(question, version)
+        content = await cache.aget(key)
+        if content is None:
+            with reads_for(version):
+                response = await render_page(request, 'polls/results.html', context)
+            await cache.aset(key, response.content, settings.POLLS_CLOSED_RESULTS_CACHE_TIMEOUT)
+        else:
+            response = HttpResponse(content)
+    return closed_results_headers(response, etag, last_modified)
+
+
+async def results_stream(request, pk):
+    """
+    Stream live changes to a poll's tally as Server-Sent Events.
+
+    The stream opens with a `snapshot` event of every choice's total, followed by `tally` events carrying the
+    per-choice changes of the votes that landed since the previous event. Only served by the async views: an idle
+    stream costs a sleeping task here, it would hold a whole worker thread of a WSGI server.
+    """
+    try:
+        question = await Question.objects.aget(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404("No question found matching the query")
+    options = settings.POLLS_RESULTS_STREAM
+    subscription = broker.subscribe(question.id)
+    choices, total_votes = await question.aresults()
+
+    async def events():
+        try:
+            yield "retry: 1000\n\n"
+            yield format_event('snapshot', {'choices': {choice.id: choice.num_votes for choice in choices}})
+            started = last_sent = time.monotonic()
+            while time.monotonic() - started < options['MAX_AGE']:
+                await asyncio.sleep(options['INTERVAL'])
+                message = stream_message(subscription, time.monotonic() - last_sent, options['HEARTBEAT'])
+                if message:
+                    last_sent = time.monotonic()
+                    yield message
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@alogin_required
+@rate_limit('vote')
+async def vote(request, question_id):
+    """Async version of `polls.views.vote`, the vote itself is written in a thread since transactions are sync."""
+    user = request.user
+    try:
+        if settings.POLLS_VOTE_INGESTION == 'queued':
+            await sync_to_async(queue_vote)(user, question_id, request.POST['choice'])
+        else:
+            await sync_to_async(cast_vote)(user, question_id, request.POST['choice'])
+    except VotingClosed:
+        return redirect('polls:index', 'error')
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        try:
+            question = await Question.objects.aget(pk=question_id)
+        except Question.DoesNotExist:
+            raise Http404("No question found matching the query")
+        version = await aedit_version(question.id)
+        with reads_for(version):  # The template renders in this thread, where it cannot query
+            await sync_to_async(prefetch_related_objects)([question], 'choice_set')
+        return render(request, 'polls/detail.html', {
+            'question': question,
+            'edit_version': version,
+            'error_message': "You didn't select a choice.",
+        })
+    return HttpResponseRedirect(reverse('polls:results', args=(question_id,)))
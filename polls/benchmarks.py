@@ -0,0 +1,96 @@
+"""Helpers for the benchmark management commands."""
+
+import datetime
+import random
+import statistics
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from .models import Choice, Question, Vote
+
+
+@contextmanager
+def test_database():
+    """Run the block against a throwaway test database, so benchmarks never touch real data."""
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(action):
+    """
+    Call `action` once.
+
+    Returns:
+        A tuple of the elapsed seconds and the number of SQL queries it ran.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - start
+    return elapsed, len(queries)
+
+
+def summarize(samples):
+    """
+    Turn (elapsed seconds, query count) samples into latency percentiles and queries per request.
+
+    The query count may be None when it cannot be captured, e.g. for requests served from other threads.
+    """
+    latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(samples),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'queries_per_request': (round(statistics.fmean(count for _, count in samples), 2)
+                                if all(count is not None for _, count in samples) else None),
+    }
+
+
+def create_fixture(polls, choices, votes, seed=0):
+    """
+    Fill the database with `polls` open polls of `choices` choices each and `votes` votes spread over them.
+
+    Votes go round the polls in turn, each cast by a voter who has not voted on that poll yet for a choice drawn
+    from a generator seeded with `seed`, so the same arguments always produce the same data. The vote counters are
+    set to match.
+
+    Returns:
+        A tuple of the polls and the voters.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    questions = Question.objects.bulk_create(
+        Question(text=f"Benchmark poll {i}", start_date=now - datetime.timedelta(days=1, seconds=i),
+                 end_date=now + datetime.timedelta(days=30))
+        for i in range(polls)
+    )
+    created = Choice.objects.bulk_create(Choice(question=question, text=f"Choice {i}")
+                                         for question in questions for i in range(choices))
+    options = [created[i * choices:(i + 1) * choices] for i in range(polls)]
+    users = User.objects.bulk_create(User(username=f"benchmark-voter-{i}") for i in range(-(-votes // polls)))
+
+    totals = Counter()
+    ballots = []
+    for i in range(votes):
+        choice = rng.choice(options[i % polls])
+        ballots.append(Vote(user=users[i // polls], question=questions[i % polls], choice=choice))
+        totals[choice.pk] += 1
+    Vote.objects.bulk_create(ballots, batch_size=1000)
+    for choice in created:
+        choice.votes = totals[choice.pk]
+    Choice.objects.bulk_update(created, ['votes'], batch_size=500)
+    return questions, users
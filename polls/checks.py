@@ -0,0 +1,78 @@
+"""System checks of the polls app."""
+
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, Tags, register
+from django.template.utils import get_app_template_dirs
+from .versions import VERSION_CACHE
+
+STATIC_TAG = re.compile(r"""{%\s*static\s+(['"])(?P<path>[^'"]+)\1""")
+CSS_URL = re.compile(r"""url\(\s*(['"]?)(?P<path>[^'")]+)\1\s*\)""")
+
+
+def _template_files():
+    directories = [directory for engine in settings.TEMPLATES for directory in engine.get('DIRS', [])]
+    for directory in [*directories, *get_app_template_dirs('templates')]:
+        for root, _, names in os.walk(directory):
+            for name in sorted(names):
+                if name.endswith(('.html', '.txt', '.xml')):
+                    yield os.path.join(root, name)
+
+
+def _stylesheet_references(name, content):
+    for match in CSS_URL.finditer(content):
+        reference = match['path'].strip()
+        if reference.startswith(('data:', '#', '/')) or '://' in reference or reference.startswith('//'):
+            continue
+        yield posixpath.normpath(posixpath.join(posixpath.dirname(name), reference.split('?')[0].split('#')[0]))
+
+
+@register(Tags.staticfiles)
+def check_static_references(app_configs, **kwargs):
+    """
+    Report the `{% static %}` tags of the templates and the `url()`s of the stylesheets naming missing files.
+
+    Tagged as a staticfiles check, so `collectstatic` refuses to run until they are fixed.
+    """
+    errors = []
+    for path in _template_files():
+        with open(path, encoding='utf-8') as file:
+            content = file.read()
+        for match in STATIC_TAG.finditer(content):
+            if not finders.find(match['path']):
+                errors.append(Error(f"{path} loads the missing static file '{match['path']}'.",
+                                    hint="Add the file to a static directory or fix the reference.",
+                                    id='polls.E001'))
+    seen = set()
+    for finder in finders.get_finders():
+        for name, storage in finder.list([]):
+            if not name.endswith('.css') or name in seen:
+                continue
+            seen.add(name)
+            with storage.open(name) as file:
+                content = file.read().decode('utf-8')
+            for reference in _stylesheet_references(name, content):
+                if not finders.find(reference):
+                    errors.append(Error(f"Stylesheet '{name}' refers to the missing static file '{reference}'.",
+                                        hint="Add the file to a static directory or fix the url().",
+                                        id='polls.E002'))
+    return errors
+
+
+@register(Tags.caches)
+def check_version_cache(app_configs, **kwargs):
+    """Report a missing version token cache, or one local to each process while several worker processes serve."""
+    if VERSION_CACHE not in settings.CACHES:
+        return [Error(f"No '{VERSION_CACHE}' cache is configured for the poll version tokens.",
+                      hint=f"Add a '{VERSION_CACHE}' alias to CACHES.", id='polls.E003')]
+    backend = settings.CACHES[VERSION_CACHE]['BACKEND']
+    if settings.WEB_CONCURRENCY > 1 and backend == 'django.core.cache.backends.locmem.LocMemCache':
+        return [Error(f"The '{VERSION_CACHE}' cache is local to each of the {settings.WEB_CONCURRENCY} worker "
+                      "processes, so a vote in one leaves the others serving stale pages and ETags.",
+                      hint="Set VERSION_CACHE_BACKEND and VERSION_CACHE_LOCATION to a cache the workers share.",
+                      id='polls.E004')]
+    return []
@@ -0,0 +1,28 @@
+"""
+Request-scoped clock.
+
+`RequestClockMiddleware` pins "now" once per request, so every status check made while serving it agrees and no
+code path calls `timezone.now()` over and over. Outside a request `now()` falls back to the current time.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.utils import timezone
+
+_pinned_now = ContextVar('polls_pinned_now', default=None)
+
+
+def now():
+    """Return the pinned time of the current request, or the current time outside of one."""
+    return _pinned_now.get() or timezone.now()
+
+
+@contextmanager
+def pinned(moment=None):
+    """Pin `now()` to `moment` (the current time by default) for the duration of the block."""
+    token = _pinned_now.set(moment or timezone.now())
+    try:
+        yield _pinned_now.get()
+    finally:
+        _pinned_now.reset(token)
@@ -0,0 +1,61 @@
+"""
+Database tuning: SQLite pragmas applied on connect, and retrying of write transactions that lose a lock race.
+
+SQLite allows one writer at a time. WAL mode lets readers carry on while it writes, `busy_timeout` makes a writer
+wait for the lock instead of failing at once, and `synchronous=NORMAL` syncs to disk at checkpoints rather than at
+every commit, which WAL keeps safe. A transaction that read before writing can still be refused the write lock
+without waiting, as can one that loses a deadlock or serialization race on PostgreSQL. `retry_on_lock` runs
+those again from the start after a randomized, growing delay.
+"""
+
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+logger = logging.getLogger(__name__)
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked')
+LOCK_SQLSTATES = ('40001', '40P01')  # serialization_failure, deadlock_detected
+
+
+def apply_sqlite_pragmas(connection):
+    """Set `POLLS_SQLITE_PRAGMAS` on a new SQLite connection."""
+    with connection.cursor() as cursor:
+        for name, value in settings.POLLS_SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def is_lock_error(error):
+    """Return whether a database error means the transaction lost a race for a lock and may simply be retried."""
+    if not isinstance(error, OperationalError):
+        return False
+    sqlstate = getattr(error.__cause__, 'sqlstate', None) or getattr(error.__cause__, 'pgcode', None)
+    return sqlstate in LOCK_SQLSTATES or any(message in str(error) for message in LOCK_MESSAGES)
+
+
+def retry_on_lock(func):
+    """
+    Run `func` again, up to `POLLS_LOCK_RETRY['ATTEMPTS']` times, when it fails on lock contention.
+
+    The delay before retry n is about `BACKOFF * 2**n` seconds, at most `MAX_DELAY`, jittered so that the writers
+    that collided do not collide again. `func` must run its own transaction: inside an outer one nothing is
+    retried, since the outer transaction cannot be replayed.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        options = settings.POLLS_LOCK_RETRY
+        for attempt in range(options['ATTEMPTS']):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if (not is_lock_error(error) or connection.in_atomic_block
+                        or attempt == options['ATTEMPTS'] - 1):
+                    raise
+                delay = min(options['BACKOFF'] * 2 ** attempt, options['MAX_DELAY']) * random.uniform(0.5, 1.5)
+                logger.info("%s hit lock contention, retrying in %.3fs", func.__qualname__, delay)
+                time.sleep(delay)
+    return wrapper
@@ -0,0 +1,321 @@
+"""
+Write-behind vote ingestion.
+
+With `POLLS_VOTE_INGESTION = 'queued'` the vote view only validates the ballot and appends it to an in-process queue.
+A background thread flushes the queue every `FLUSH_INTERVAL` seconds, or as soon as `BATCH_SIZE` ballots are
+waiting, coalescing ballots to the last one per (user, question) and writing them with bulk_create/bulk_update in
+a single transaction.
+
+`DURABILITY` controls what a crash can lose: 'memory' keeps ballots only in memory, 'journal' also appends them to
+a journal before the view returns, and 'fsync' additionally fsyncs each append. Each process journals to a file of
+its own, `JOURNAL` with the process id added, e.g. vote-queue.1234.jsonl, and holds an `flock` on it while alive.
+When a queue is created it takes over the journals whose process is gone, so ballots that were not flushed are
+replayed by exactly one process.
+"""
+
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, close_old_connections, transaction
+from .models import Choice, Vote, VoteRollup
+from .signals import votes_changed
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_LEVELS = ('memory', 'journal', 'fsync')
+
+
+class VoteQueue:
+    """Buffers ballots in memory, optionally journaled to disk, and flushes them to the database in batches."""
+
+    def __init__(self, flush_interval=0.5, batch_size=500, durability='memory', journal=None):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown vote queue durability {durability!r}, expected one of {DURABILITY_LEVELS}.")
+        if durability != 'memory' and not journal:
+            raise ValueError(f"A journal path is required for {durability!r} durability.")
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.durability = durability
+        self.journal = self.process_journal(journal) if durability != 'memory' else None
+        self._pending = []
+        self._lock = threading.Lock()  # Guards the pending list and the journal file
+        self._flush_lock = threading.Lock()  # Serializes flushes
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._journal_file = None
+        self._journal_lock = None
+        if self.journal:
+            self._journal_lock = _lock_journal(self.journal, blocking=False)
+            if self._journal_lock is None:
+                raise RuntimeError(f"The vote journal {self.journal} is in use by another queue.")
+            self._recover(journal)
+
+    @staticmethod
+    def process_journal(journal):
+        """Return the journal of the current process, `journal` with the process id before its extension."""
+        root, extension = os.path.splitext(str(journal))
+        return f"{root}.{os.getpid()}{extension}"
+
+    @property
+    def flushing_journal(self):
+        """Path the journal is moved to while its ballots are being written."""
+        return self.journal + '.flushing'
+
+    def _recover(self, journal):
+        """
+        Reload ballots left in this process's journal, then take over the journals of processes that are gone.
+
+        Taken over ballots are copied into this process's journal before theirs is removed, so a crash meanwhile
+        loses nothing. The journal at `journal` itself, shared by all processes before journals were per process,
+        is taken over too.
+        """
+        if os.path.exists(self.flushing_journal):
+            self._set_aside_journal()
+            os.replace(self.flushing_journal, self.journal)
+        if os.path.exists(self.journal):
+            with open(self.journal) as file:
+                self._pending.extend(_read_ballots(file))
+        root, extension = os.path.splitext(str(journal))
+        pattern = glob.escape(root) + '.*' + extension
+        orphans = {str(journal), *glob.glob(pattern),
+                   *(path[:-len('.flushing')] for path in glob.glob(pattern + '.flushing'))}
+        for orphan in sorted(orphans - {self.journal}):
+            lock = _lock_journal(orphan, blocking=False)
+            if lock is None:
+                continue  # Its process is alive, or another one is taking it over
+            try:
+                ballots = []
+                for path in (orphan + '.flushing', orphan):
+                    if os.path.exists(path):
+                        with open(path) as file:
+                            ballots.extend(_read_ballots(file))
+                if ballots:
+                    self._write_journal(ballots)
+                    self._pending.extend(ballots)
+                for path in (orphan + '.flushing', orphan, orphan + '.lock'):
+                    if os.path.exists(path):
+                        os.remove(path)
+            finally:
+                lock.close()
+        if self._pending:
+            logger.info("Recovered %d unflushed ballots into %s", len(self._pending), self.journal)
+
+    def _set_aside_journal(self):
+        """Move the journal's ballots to the end of the flushing journal, keeping them in arrival order."""
+        if not os.path.exists(self.journal):
+            return
+        if not os.path.exists(self.flushing_journal):
+            os.replace(self.journal, self.flushing_journal)
+            return
+        with open(self.journal) as journal, open(self.flushing_journal, 'a') as flushing:
+            flushing.write(journal.read())
+        os.remove(self.journal)
+
+    def _write_journal(self, ballots):
+        if self._journal_file is None:
+            self._journal_file = open(self.journal, 'a')
+        self._journal_file.writelines(json.dumps(ballot) + '\n' for ballot in ballots)
+        self._journal_file.flush()
+        if self.durability == 'fsync':
+            os.fsync(self._journal_file.fileno())
+
+    def submit(self, user_id, question_id, choice_id):
+        """Queue a ballot, starting the flusher on first use."""
+        ballot = (user_id, question_id, choice_id)
+        with self._lock:
+            if self.journal:
+                self._write_journal([ballot])
+            self._pending.append(ballot)
+            backlog = len(self._pending)
+        if self._thread is None:
+            self.start()
+        if backlog >= self.batch_size:
+            self._wake.set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def start(self):
+        """Start the background flusher thread."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='vote-queue-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing queued votes failed, they will be retried")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """
+        Write every pending ballot to the database.
+
+        Returns:
+            The number of (user, question) votes written after coalescing.
+        """
+        with self._flush_lock:
+            with self._lock:
+                ballots, self._pending = self._pending, []
+                if self.journal:
+                    if self._journal_file is not None:
+                        self._journal_file.close()
+                        self._journal_file = None
+                    self._set_aside_journal()
+            if not ballots:
+                return 0
+            try:
+                try:
+                    written = apply_ballots(ballots, self.batch_size)
+                except IntegrityError:
+                    written = apply_ballots_one_by_one(ballots)
+            except Exception:
+                # The ballots stay in the flushing journal, later ones are appended behind them on the next attempt.
+                with self._lock:
+                    self._pending[:0] = ballots
+                raise
+            if self.journal and os.path.exists(self.flushing_journal):
+                os.remove(self.flushing_journal)
+            return written
+
+    def drain(self):
+        """Stop the flusher and write whatever is still queued, for use on shutdown."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        try:
+            self.flush()
+        finally:
+            self.close()
+
+    def close(self):
+        """Close the journal and release its lock, leaving unflushed ballots in it for another process."""
+        with self._lock:
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
+            if self._journal_lock is not None:
+                self._journal_lock.close()
+                self._journal_lock = None
+
+
+def _lock_journal(journal, blocking=True):
+    """Take the lock of a journal, returning the open lock file that holds it, or None if it is held elsewhere."""
+    try:
+        import fcntl  # POSIX only, and only needed by journaled queues
+    except ImportError:
+        raise ImproperlyConfigured("Journaled vote queues lock their journals with fcntl, which this platform lacks. "
+                                   "Set POLLS_VOTE_QUEUE['DURABILITY'] to 'memory'.")
+    lock = open(journal + '.lock', 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def _read_ballots(file):
+    return [tuple(json.loads(line)) for line in file if line.strip()]
+
+
+def apply_ballots(ballots, batch_size=500):
+    """
+    Write (user id, question id, choice id) ballots in one transaction, the last ballot per user and poll winning.
+
+    The votes are timed, and rolled up, at the moment they are written rather than when they were queued.
+
+    Returns:
+        The number of votes created or changed.
+    """
+    latest = {}
+    for user_id, question_id, choice_id in ballots:
+        latest[user_id, question_id] = choice_id
+
+    with transaction.atomic():
+        existing = {}
+        pairs = list(latest)
+        for start in range(0, len(pairs), batch_size):
+            # A chunk's users and polls cross, the votes of pairs that were not balloted are left out.
+            chunk = pairs[start:start + batch_size]
+            votes = Vote.objects.select_for_update().filter(user_id__in={user_id for user_id, _ in chunk},
+                                                            question_id__in={question_id for _, question_id in chunk})
+            for vote in votes.only('id', 'user_id', 'question_id', 'choice_id'):
+                if (vote.user_id, vote.question_id) in latest:
+                    existing[vote.user_id, vote.question_id] = vote
+
+        deltas = defaultdict(lambda: defaultdict(int))  # Per question, per choice
+        created, changed = [], []
+        for (user_id, question_id), choice_id in latest.items():
+            vote = existing.get((user_id, question_id))
+            if vote is None:
+                created.append(Vote(user_id=user_id, question_id=question_id, choice_id=choice_id))
+            elif vote.choice_id != choice_id:
+                deltas[question_id][vote.choice_id] -= 1
+                vote.choice_id = choice_id
+                changed.append(vote)
+            else:
+                continue
+            deltas[question_id][choice_id] += 1
+
+        Vote.objects.bulk_create(created, batch_size=batch_size)
+        Vote.objects.bulk_update(changed, ['choice'], batch_size=batch_size)
+        Choice.apply_vote_deltas({pk: amount for changes in deltas.values() for pk, amount in changes.items()})
+        for question_id, changes in deltas.items():
+            changes = {pk: amount for pk, amount in changes.items() if amount}
+            if changes:
+                VoteRollup.add(question_id, changes)
+                transaction.on_commit(partial(votes_changed.send, sender=Vote, question_id=question_id, deltas=changes))
+    return len(created) + len(changed)
+
+
+def apply_ballots_one_by_one(ballots):
+    """
+    Write ballots individually, dropping the ones the database refuses.
+
+    Used when a batch fails on a constraint, for example a ballot of a user or poll deleted meanwhile, so a single
+    bad ballot cannot hold back the whole queue.
+    """
+    latest = {}
+    for user_id, question_id, choice_id in ballots:
+        latest[user_id, question_id] = choice_id
+    written = 0
+    for (user_id, question_id), choice_id in latest.items():
+        try:
+            written += apply_ballots([(user_id, question_id, choice_id)])
+        except IntegrityError:
+            logger.warning("Dropped queued vote of user %s for choice %s of poll %s", user_id, choice_id, question_id)
+    return written
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_vote_queue():
+    """Return the process-wide vote queue configured by `POLLS_VOTE_QUEUE`, creating it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            options = settings.POLLS_VOTE_QUEUE
+            _queue = VoteQueue(flush_interval=options['FLUSH_INTERVAL'], batch_size=options['BATCH_SIZE'],
+                               durability=options['DURABILITY'], journal=options.get('JOURNAL'))
+            atexit.register(_queue.drain)
+        return _queue
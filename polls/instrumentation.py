@@ -0,0 +1,192 @@
+"""
+Per-view request metrics: SQL query count, database time, template render time and total latency.
+
+`InstrumentationMiddleware` times every request into a `Sample`. Queries are timed by an execute wrapper installed
+on every database connection as it is created, templates by the `TimedDjangoTemplates` backend, both adding to the
+sample of the request being served. The sample is found through a context variable, which `sync_to_async` carries
+over to the threads running the ORM calls of async views. Samples
+are aggregated per URL name, e.g. `polls:vote`. The latest `WINDOW` samples of each view feed the p50/p95/p99
+figures, which are dumped to `DUMP_FILE` every `DUMP_INTERVAL` seconds and served in the Prometheus text format by
+the `metrics` view.
+"""
+
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates
+
+_current = ContextVar('polls_instrumentation_sample', default=None)
+
+QUANTILES = (0.5, 0.95, 0.99)
+MEASURES = ('total', 'db', 'template', 'queries')
+
+
+class Sample:
+    """The costs of one request, in seconds except for the query count."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.total = 0.0
+
+    def server_timing(self):
+        """Return the sample as the value of a `Server-Timing` header, in milliseconds."""
+        return (f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries", '
+                f'tpl;dur={self.template * 1000:.2f}, total;dur={self.total * 1000:.2f}')
+
+
+def _time_query(execute, sql, params, many, context):
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.db += time.perf_counter() - start
+
+
+def instrument_connection(connection):
+    """Time the queries of a database connection into the sample of the request being served, if any."""
+    if _time_query not in connection.execute_wrappers:  # Reconnections keep their wrappers
+        connection.execute_wrappers.append(_time_query)
+
+
+@contextmanager
+def recording():
+    """Collect the queries and template renders of the block into a new `Sample`, timing the block as its total."""
+    sample = Sample()
+    token = _current.set(sample)
+    start = time.perf_counter()
+    try:
+        yield sample
+    finally:
+        sample.total = time.perf_counter() - start
+        _current.reset(token)
+
+
+class TimedTemplate:
+    """Wraps a template of the Django backend to add its render time to the current request's sample."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        """Render the template, timing it."""
+        sample = _current.get()
+        if sample is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            sample.template += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with each render timed into the current request's sample."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def _quantiles(values):
+    values = sorted(values)
+    cuts = statistics.quantiles(values, n=100, method='inclusive') if len(values) > 1 else values * 99
+    return {q: cuts[round(q * 100) - 1] for q in QUANTILES}
+
+
+class Metrics:
+    """Aggregates request samples per view: running counts and sums, and quantiles over a recent window."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._views = {}
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+
+    def add(self, view, sample):
+        """Record a sample of `view`."""
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = {
+                    'count': 0, 'sums': dict.fromkeys(MEASURES, 0.0),
+                    'recent': {measure: deque(maxlen=self.window) for measure in MEASURES},
+                }
+            stats['count'] += 1
+            for measure in MEASURES:
+                value = getattr(sample, measure)
+                stats['sums'][measure] += value
+                stats['recent'][measure].append(value)
+
+    def summary(self):
+        """
+        Return {view: {'count': ..., measure: {'sum': ..., 'p50': ..., 'p95': ..., 'p99': ...}}}.
+
+        Times are in seconds, sums cover every request since start-up, quantiles the latest `window` ones.
+        """
+        with self._lock:
+            views = {view: (stats['count'], dict(stats['sums']),
+                            {measure: list(values) for measure, values in stats['recent'].items()})
+                     for view, stats in self._views.items()}
+        summary = {}
+        for view, (count, sums, recent) in sorted(views.items()):
+            summary[view] = {'count': count}
+            for measure in MEASURES:
+                quantiles = _quantiles(recent[measure])
+                summary[view][measure] = {'sum': sums[measure],
+                                          **{f"p{round(q * 100)}": value for q, value in quantiles.items()}}
+        return summary
+
+    def prometheus(self):
+        """Return the summary in the Prometheus text exposition format."""
+        metrics = {
+            'total': ('polls_request_duration_seconds', "Request latency per view."),
+            'db': ('polls_request_db_seconds', "Time spent in SQL queries per request, per view."),
+            'template': ('polls_request_template_seconds', "Time spent rendering templates per request, per view."),
+            'queries': ('polls_request_queries', "SQL queries per request, per view."),
+        }
+        summary = self.summary()
+        lines = []
+        for measure, (name, description) in metrics.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} summary"]
+            for view, stats in summary.items():
+                label = view.replace('\\', '\\\\').replace('"', '\\"')
+                for q in QUANTILES:
+                    lines.append(f'{name}{{view="{label}",quantile="{q}"}} {stats[measure][f"p{round(q * 100)}"]}')
+                lines.append(f'{name}_sum{{view="{label}"}} {stats[measure]["sum"]}')
+                lines.append(f'{name}_count{{view="{label}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def dump_due(self, interval):
+        """Return whether `interval` seconds have passed since the previous dump, starting a new interval if so."""
+        with self._lock:
+            if time.monotonic() - self._last_dump < interval:
+                return False
+            self._last_dump = time.monotonic()
+            return True
+
+    def dump(self, path):
+        """Write the summary to `path` as JSON, replacing the previous dump atomically."""
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as file:
+            json.dump(self.summary(), file, indent=2)
+        os.replace(temporary, path)
+
+
+metrics = Metrics()
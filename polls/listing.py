@@ -0,0 +1,171 @@
+"""Cached, keyset-paginated poll listing for the index page."""
+
+import base64
+import binascii
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import Min, Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from . import clock
+from .models import Question
+from .versions import VERSION_CACHE, reads_for
+
+INDEX_VERSION_KEY = 'polls:index:version'
+STATUSES = (Question.OPEN, Question.CLOSED)
+
+
+def encode_cursor(question):
+    """Return an opaque cursor pointing just after `question` in the listing order."""
+    raw = f"{question.start_date.isoformat()}|{question.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (start_date, id) pair hidden in a cursor, raising Http404 if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        start, pk = raw.split('|')
+        start_date = parse_datetime(start)
+        if start_date is None:
+            raise ValueError(start)
+        return start_date, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise Http404("Invalid cursor.")
+
+
+def _boundary_aggregates(now):
+    return {'next_start': Min('start_date', filter=Q(start_date__gt=now)),
+            'next_end': Min('end_date', filter=Q(end_date__gt=now))}
+
+
+def _earliest(bounds):
+    candidates = [bound for bound in bounds.values() if bound is not None]
+    return min(candidates) if candidates else None
+
+
+def next_boundary(now):
+    """Return the next moment a poll opens or closes after `now`, or None if no poll will change state."""
+    return _earliest(Question.objects.aggregate(**_boundary_aggregates(now)))
+
+
+async def anext_boundary(now):
+    """Async version of `next_boundary`."""
+    return _earliest(await Question.objects.aaggregate(**_boundary_aggregates(now)))
+
+
+def listing_version():
+    """
+    Return the token that namespaces every cached listing page.
+
+    Kept in the shared `versions` cache like the poll version tokens, so a poll added by one worker process drops
+    the listing pages of all of them.
+    """
+    versions = caches[VERSION_CACHE]
+    version = versions.get(INDEX_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        versions.set(INDEX_VERSION_KEY, version, None)
+    return version
+
+
+async def alisting_version():
+    """Async version of `listing_version`."""
+    versions = caches[VERSION_CACHE]
+    version = await versions.aget(INDEX_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        await versions.aset(INDEX_VERSION_KEY, version, None)
+    return version
+
+
+def _page_key(version, status, cursor):
+    return f"polls:index:{version}:{status}:{cursor}"
+
+
+def _cached_page(entry, now):
+    """Return the (polls, next cursor) of a cache entry that is still valid at `now`, else None."""
+    if entry is not None and (entry['expires'] is None or now < entry['expires']):
+        return entry['polls'], entry['next_cursor']
+    return None
+
+
+def _page_queryset(status, cursor, now):
+    """Return the queryset of a page, one row longer than the page to tell whether another page follows."""
+    queryset = getattr(Question.objects, status)(now) if status else Question.objects.published(now)
+    if cursor:
+        start_date, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(start_date__lt=start_date) | Q(start_date=start_date, pk__lt=pk))
+    return queryset.with_is_open(now).order_by('-start_date', '-pk')[:settings.POLLS_INDEX_PAGE_SIZE + 1]
+
+
+def _page_entry(rows, expires):
+    """Split the fetched rows into the page and the next cursor, wrapped as a cache entry."""
+    page_size = settings.POLLS_INDEX_PAGE_SIZE
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return {'polls': rows[:page_size], 'next_cursor': next_cursor, 'expires': expires}
+
+
+def _timeout(expires, now):
+    return None if expires is None else math.ceil((expires - now).total_seconds())
+
+
+def _clean_arguments(status, cursor):
+    """Drop unknown statuses and reject malformed cursors before they reach a cache key."""
+    if status not in STATUSES:
+        status = ''
+    if cursor:
+        decode_cursor(cursor)
+    return status, cursor
+
+
+def get_poll_page(status='', cursor='', now=None):
+    """
+    Return one page of published polls, newest first, each annotated with `is_open`.
+
+    Pages are ordered by (start_date, id) descending and continue after the poll encoded in `cursor`.
+    `status` may be 'open' or 'closed' to filter in SQL, anything else lists every published poll.
+    Each page is cached until the next start/end boundary, since that is the earliest it can change
+    without a Question being saved or deleted (which invalidates all pages through signals).
+
+    Returns:
+        A tuple of the polls on the page and the cursor of the next page, or None on the last page.
+    """
+    now = now or clock.now()
+    status, cursor = _clean_arguments(status, cursor)
+    version = listing_version()
+    key = _page_key(version, status, cursor)
+    page = _cached_page(cache.get(key), now)
+    if page is not None:
+        return page
+
+    with reads_for(version):
+        expires = next_boundary(now)
+        entry = _page_entry(list(_page_queryset(status, cursor, now)), expires)
+    cache.set(key, entry, _timeout(expires, now))
+    return entry['polls'], entry['next_cursor']
+
+
+async def aget_poll_page(status='', cursor='', now=None):
+    """Async version of `get_poll_page`, using the async cache and ORM APIs."""
+    now = now or clock.now()
+    status, cursor = _clean_arguments(status, cursor)
+    version = await alisting_version()
+    key = _page_key(version, status, cursor)
+    page = _cached_page(await cache.aget(key), now)
+    if page is not None:
+        return page
+
+    with reads_for(version):
+        expires = await anext_boundary(now)
+        entry = _page_entry([poll async for poll in _page_queryset(status, cursor, now).aiterator()], expires)
+    await cache.aset(key, entry, _timeout(expires, now))
+    return entry['polls'], entry['next_cursor']
+
+
+def invalidate_poll_listing():
+    """Drop every cached listing page by moving to a new version."""
+    caches[VERSION_CACHE].set(INDEX_VERSION_KEY, time.time_ns(), None)
@@ -0,0 +1,142 @@
+"""Run the polls app's load scenarios on generated data and report, or compare, their costs as JSON."""
+
+import json
+import platform
+import random
+import subprocess
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from polls.benchmarks import create_fixture, measure, summarize, test_database
+
+
+def index_browse(questions, users, requests, rng):
+    """Page through the index as an anonymous visitor, following the "Older polls" cursor and starting over."""
+    client = Client()
+    samples = []
+    response = None
+
+    def browse(cursor):
+        nonlocal response
+        response = client.get(reverse('polls:index'), {'cursor': cursor} if cursor else {})
+
+    while len(samples) < requests:
+        cursor = response.context['next_cursor'] if response is not None else None
+        samples.append(measure(lambda: browse(cursor)))
+    return samples
+
+
+def vote_storm(questions, users, requests, rng):
+    """Cast and change votes of logged in voters on random polls."""
+    clients = []
+    for user in User.objects.filter(pk__in=[user.pk for user in users[:requests]]):
+        client = Client()
+        client.force_login(user)
+        clients.append(client)
+    ballots = [(rng.choice(clients), rng.choice(questions)) for _ in range(requests)]
+    choices = {question.pk: list(question.choice_set.values_list('pk', flat=True)) for question in questions}
+    return [
+        measure(lambda: client.post(reverse('polls:vote', args=(question.pk,)),
+                                    {'choice': rng.choice(choices[question.pk])}))
+        for client, question in ballots
+    ]
+
+
+def results_refresh(questions, users, requests, rng):
+    """Reload the results pages of a few popular polls, as visitors watching them do."""
+    client = Client()
+    popular = questions[:10]
+    return [measure(lambda: client.get(reverse('polls:results', args=(rng.choice(popular).pk,))))
+            for _ in range(requests)]
+
+
+SCENARIOS = {'index_browse': index_browse, 'vote_storm': vote_storm, 'results_refresh': results_refresh}
+
+
+def git_commit():
+    """Return the commit of the working tree, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """
+    Generate N polls × M choices × K votes on a throwaway database and run the load scenarios against them.
+
+    Scenarios go through the Django test client one request at a time, so queries can be counted per request.
+    Rate limiting is off while they run, or the vote storm would mostly measure its own 429s. The report is JSON;
+    give an earlier report to --compare to see how each figure moved since.
+    """
+
+    help = "Benchmark the polls app: requests/sec, latency percentiles and queries per request, as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polls', type=int, default=100, help="Number of polls (default 100).")
+        parser.add_argument('--choices', type=int, default=4, help="Choices per poll (default 4).")
+        parser.add_argument('--votes', type=int, default=10000, help="Votes spread over the polls (default 10000).")
+        parser.add_argument('--requests', type=int, default=300, help="Requests per scenario (default 300).")
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help="Scenario to run, may be repeated (default all).")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the generated data and requests.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of standard output.")
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help="An earlier JSON report to compare this run with.")
+
+    def handle(self, *args, **options):
+        if options['polls'] < 1 or options['choices'] < 1:
+            raise CommandError("A benchmark needs at least one poll with one choice.")
+        report = {
+            'commit': git_commit(),
+            'date': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'parameters': {name: options[name] for name in ('polls', 'choices', 'votes', 'requests', 'seed')},
+            'scenarios': {},
+        }
+        no_limits = {**settings.POLLS_RATE_LIMITS, 'ENABLED': False}
+        with test_database(), override_settings(POLLS_RATE_LIMITS=no_limits):
+            questions, users = create_fixture(options['polls'], options['choices'], options['votes'],
+                                              options['seed'])
+            for name in options['scenario'] or SCENARIOS:
+                cache.clear()
+                samples = SCENARIOS[name](questions, users, options['requests'], random.Random(options['seed']))
+                # Requests run one after another, so their latencies add up to the time spent serving them.
+                served = sum(elapsed for elapsed, _ in samples)
+                report['scenarios'][name] = {'requests_per_second': round(len(samples) / served, 1),
+                                             **summarize(samples)}
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+    def compare(self, report, path):
+        """Print the relative change of every figure shared with the baseline report."""
+        with open(path) as file:
+            baseline = json.load(file)
+        self.stderr.write(f"Compared with {baseline.get('commit') or path}:")
+        for name, stats in report['scenarios'].items():
+            before = baseline.get('scenarios', {}).get(name)
+            if before is None:
+                continue
+            changes = []
+            for figure in ('requests_per_second', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'):
+                old, new = before.get(figure), stats.get(figure)
+                if old and new is not None:
+                    changes.append(f"{figure} {old} -> {new} ({(new - old) * 100 / old:+.1f}%)")
+            self.stderr.write(f"  {name}: {', '.join(changes)}")
@@ -0,0 +1,92 @@
+"""Compare the throughput of the sync views under WSGI with the async views under ASGI."""
+
+import asyncio
+import datetime
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+from polls.benchmarks import summarize, test_database
+from polls.models import Choice, Question
+from polls.urls import build_urlpatterns
+
+
+def urlconf(use_async_views):
+    """Build a root URLconf serving either the sync or the async polls views."""
+    module = types.ModuleType(f"benchmark_urls_{'async' if use_async_views else 'sync'}")
+    module.urlpatterns = [
+        path('accounts/', include('django.contrib.auth.urls')),
+        path('polls/', include((build_urlpatterns(use_async_views), 'polls'))),
+    ]
+    return module
+
+
+def run_wsgi(url, requests, concurrency):
+    """Fetch `url` through the WSGI handler from `concurrency` threads, returning latencies and wall time."""
+    def fetch(_):
+        start = time.perf_counter()
+        Client().get(url)
+        return time.perf_counter() - start, None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(fetch, range(requests)))
+    return samples, time.perf_counter() - start
+
+
+def run_asgi(url, requests, concurrency):
+    """Fetch `url` through the ASGI handler with `concurrency` requests in flight, returning latencies and wall time."""
+    async def main():
+        gate = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def fetch():
+            async with gate:
+                start = time.perf_counter()
+                await client.get(url)
+                return time.perf_counter() - start, None
+
+        return await asyncio.gather(*(fetch() for _ in range(requests)))
+
+    start = time.perf_counter()
+    samples = asyncio.run(main())
+    return samples, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    """Load the index and results pages through both handlers on a throwaway database and report requests/sec."""
+
+    help = "Benchmark sync WSGI views against async ASGI views: requests/sec and latency percentiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help="Requests per scenario (default 300).")
+        parser.add_argument('--concurrency', type=int, default=8, help="Requests in flight (default 8).")
+        parser.add_argument('--polls', type=int, default=50, help="Number of polls (default 50).")
+        parser.add_argument('--choices', type=int, default=4, help="Choices per poll (default 4).")
+
+    def handle(self, *args, **options):
+        with test_database():
+            now = timezone.now()
+            questions = Question.objects.bulk_create(
+                Question(text=f"Poll {i}", start_date=now - datetime.timedelta(days=1),
+                         end_date=now + datetime.timedelta(days=1))
+                for i in range(options['polls'])
+            )
+            Choice.objects.bulk_create(Choice(question=question, text=f"Choice {i}")
+                                       for question in questions for i in range(options['choices']))
+
+            for mode, use_async_views, run in (("WSGI/sync", False, run_wsgi), ("ASGI/async", True, run_asgi)):
+                with override_settings(ROOT_URLCONF=urlconf(use_async_views)):
+                    scenarios = (("index", reverse('polls:index')),
+                                 ("results", reverse('polls:results', args=(questions[0].pk,))))
+                    for scenario, url in scenarios:
+                        samples, wall = run(url, options['requests'], options['concurrency'])
+                        stats = summarize(samples)
+                        self.stdout.write(
+                            f"{mode:>10} {scenario:>7}: {stats['requests'] / wall:8.1f} req/s, "
+                            f"p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, p99 {stats['p99_ms']} ms"
+                        )
@@ -0,0 +1,70 @@
+"""Measure vote throughput on a single hot poll as the number of vote counter shards goes up."""
+
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+from polls.benchmarks import test_database
+from polls.models import Question
+from polls.voting import cast_vote
+
+
+class Command(BaseCommand):
+    """
+    Cast votes on one poll from many threads at once on a throwaway database, once per shard count.
+
+    SQLite serializes every writer whatever the shard count, the contention shards remove only shows on databases
+    with row locks such as PostgreSQL.
+    """
+
+    help = "Benchmark concurrent vote throughput on one poll for several vote counter shard counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', default='1,4,16',
+                            help="Comma-separated shard counts to compare (default 1,4,16).")
+        parser.add_argument('--threads', type=int, default=8, help="Number of concurrent voters (default 8).")
+        parser.add_argument('--votes', type=int, default=50, help="Votes cast by each voter (default 50).")
+
+    def handle(self, *args, **options):
+        try:
+            shard_counts = [int(count) for count in options['shards'].split(',')]
+        except ValueError:
+            raise CommandError("--shards must be a comma-separated list of integers.")
+        if any(count < 1 for count in shard_counts):
+            raise CommandError("Shard counts must be at least 1.")
+
+        with test_database():
+            self.stdout.write(f"{connection.vendor}, {options['threads']} threads x {options['votes']} votes")
+            for shards in shard_counts:
+                elapsed = self.run(shards, options['threads'], options['votes'])
+                total = options['threads'] * options['votes']
+                self.stdout.write(f"{shards:>4} shard(s): {total} votes in {elapsed:.3f} s, "
+                                  f"{total / elapsed:.0f} votes/s")
+
+    # A losing writer retries quickly and often, the benchmark measures contention rather than giving up on it.
+    @override_settings(POLLS_LOCK_RETRY={'ATTEMPTS': 100, 'BACKOFF': 0.001, 'MAX_DELAY': 0.02})
+    def run(self, shards, threads, votes):
+        """Cast `votes` votes from each of `threads` voters at once, returning the elapsed seconds."""
+        now = timezone.now()
+        question = Question.objects.create(text=f"Hot poll, {shards} shard(s)",
+                                           start_date=now - datetime.timedelta(days=1),
+                                           end_date=now + datetime.timedelta(days=1))
+        choices = [question.choice_set.create(text=f"Choice {i}").id for i in range(2)]
+        users = User.objects.bulk_create(User(username=f"hot{question.id}-{i}") for i in range(threads))
+
+        def vote(user):
+            try:
+                for i in range(votes):
+                    cast_vote(user, question.id, choices[i % len(choices)])
+            finally:
+                connections.close_all()
+
+        with override_settings(POLLS_VOTE_COUNTER_SHARDS=shards), ThreadPoolExecutor(max_workers=threads) as pool:
+            start = time.perf_counter()
+            list(pool.map(vote, User.objects.filter(pk__in=[user.pk for user in users])))
+            return time.perf_counter() - start
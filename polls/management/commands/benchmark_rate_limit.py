@@ -0,0 +1,64 @@
+"""Measure the per-request cost of the rate limiter."""
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from polls.benchmarks import summarize
+from polls.throttling import client_of, rate_limit
+
+
+def view(request):
+    """A view doing no work of its own, so only the limiter's cost is measured."""
+    return HttpResponse()
+
+
+class Command(BaseCommand):
+    """
+    Call a no-op view with and without the rate limiter and report the latency the limiter adds.
+
+    Buckets are kept in the configured `POLLS_RATE_LIMITS['CACHE']` cache, so the figures include its round trips.
+    """
+
+    help = "Benchmark the rate limiter: latency per request with and without it, for admitted and refused requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000, help="Requests per run (default 20000).")
+        parser.add_argument('--clients', type=int, default=100, help="Distinct client addresses (default 100).")
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        requests = [factory.post('/', REMOTE_ADDR=f"10.0.{i // 256 % 256}.{i % 256}")
+                    for i in range(options['clients'])]
+        limits = settings.POLLS_RATE_LIMITS
+        cache = caches[limits['CACHE']]
+        keys = [f"polls:rate-limit:benchmark:{client_of(request)}" for request in requests]
+        runs = {
+            "no limiter": (view, 10 ** 9),
+            "admitted": (rate_limit('benchmark')(view), 10 ** 9),
+            "refused": (rate_limit('benchmark')(view), 1),
+        }
+        baseline = None
+        for name, (handler, burst) in runs.items():
+            endpoints = {**limits['ENDPOINTS'], 'benchmark': {'RATE': '1/day', 'BURST': burst}}
+            cache.delete_many(keys)
+            with override_settings(POLLS_RATE_LIMITS={**limits, 'ENABLED': True, 'ENDPOINTS': endpoints}):
+                for request in requests:  # Warm up, and empty the buckets of the refused run
+                    handler(request)
+                samples = []
+                for i in range(options['requests']):
+                    request = requests[i % len(requests)]
+                    start = time.perf_counter()
+                    handler(request)
+                    samples.append((time.perf_counter() - start, None))
+            stats = summarize(samples)
+            baseline = stats['mean_ms'] if baseline is None else baseline
+            self.stdout.write(
+                f"{name:>10}: mean {stats['mean_ms'] * 1000:.1f} µs, p50 {stats['p50_ms'] * 1000:.1f} µs, "
+                f"p99 {stats['p99_ms'] * 1000:.1f} µs, overhead {(stats['mean_ms'] - baseline) * 1000:+.1f} µs"
+            )
+        cache.delete_many(keys)
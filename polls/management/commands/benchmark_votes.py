@@ -0,0 +1,48 @@
+"""Measure the query count and latency of the vote endpoint."""
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from polls.benchmarks import measure, summarize, test_database
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Cast new and changed votes through the vote view on a throwaway database and report per-vote costs."""
+
+    help = "Benchmark the vote endpoint: SQL queries and latency per vote, for new and changed votes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=200, help="Number of voters (default 200).")
+        parser.add_argument('--choices', type=int, default=4, help="Number of choices on the poll (default 4).")
+
+    def handle(self, *args, **options):
+        with test_database():
+            now = timezone.now()
+            question = Question.objects.create(text="Benchmark poll", start_date=now - datetime.timedelta(days=1),
+                                               end_date=now + datetime.timedelta(days=1))
+            choices = [question.choice_set.create(text=f"Choice {i}").id for i in range(options['choices'])]
+            users = User.objects.bulk_create(User(username=f"voter{i}") for i in range(options['votes']))
+            url = reverse('polls:vote', args=(question.id,))
+
+            clients = []
+            for user in User.objects.filter(pk__in=[user.pk for user in users]):
+                client = Client()
+                client.force_login(user)
+                clients.append(client)
+
+            for phase, offset in (("new vote", 0), ("changed vote", 1)):
+                samples = [
+                    measure(lambda: client.post(url, {'choice': choices[(i + offset) % len(choices)]}))
+                    for i, client in enumerate(clients)
+                ]
+                stats = summarize(samples)
+                self.stdout.write(
+                    f"{phase:>12}: {stats['requests']} votes, {stats['queries_per_request']} queries/vote, "
+                    f"mean {stats['mean_ms']} ms, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, "
+                    f"p99 {stats['p99_ms']} ms"
+                )
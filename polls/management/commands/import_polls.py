@@ -0,0 +1,164 @@
+"""Bulk-create polls and their choices from a CSV or JSON lines file."""
+
+import csv
+import json
+import sys
+import time
+from itertools import groupby
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from polls.listing import invalidate_poll_listing
+from polls.models import Choice, Question
+
+CSV_COLUMNS = ('question', 'start_date', 'end_date', 'choice')
+
+
+def read_jsonl(lines):
+    """
+    Yield (line number, record) for a JSON lines file.
+
+    Each line holds one poll: {"question": ..., "start_date": ..., "end_date": ..., "choices": [...]}, the choices
+    being texts or, as written by `export_results`, objects with a "text".
+    """
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as error:
+                yield number, error
+
+
+def read_csv(lines):
+    """
+    Yield (line number, record) for a CSV file with `question,start_date,end_date,choice` columns.
+
+    A poll spans consecutive rows sharing the same question and dates, one row per choice, and the same
+    `question_id` when that column is present, as in the files written by `export_results`. Other columns are
+    ignored.
+    """
+    reader = csv.DictReader(lines)
+    if not set(CSV_COLUMNS) <= set(reader.fieldnames or ()):
+        raise CommandError(f"Expected the CSV columns {','.join(CSV_COLUMNS)}.")
+    rows = ((reader.line_num, row) for row in reader)
+    poll_of = (lambda item: (item[1].get('question_id'), item[1]['question'], item[1]['start_date'],
+                             item[1]['end_date']))
+    for _, group in groupby(rows, key=poll_of):
+        group = list(group)
+        first = group[0][1]
+        yield group[0][0], {'question': first['question'], 'start_date': first['start_date'],
+                            'end_date': first['end_date'], 'choices': [row['choice'] for _, row in group]}
+
+
+def parse_date(value):
+    """Parse an ISO 8601 date and time, taking naive ones to be in the current time zone."""
+    moment = parse_datetime(value) if isinstance(value, str) else None
+    if moment is None:
+        raise ValidationError(f"Invalid date {value!r}.")
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def build_poll(record):
+    """
+    Turn one record into an unsaved poll and its unsaved choices.
+
+    Raises:
+        ValidationError: If the record does not describe a valid poll with at least one choice.
+    """
+    if isinstance(record, Exception):
+        raise ValidationError(f"Invalid JSON: {record}")
+    if not isinstance(record, dict):
+        raise ValidationError("Expected an object.")
+    question = Question(text=record.get('question') or '', start_date=parse_date(record.get('start_date')),
+                        end_date=parse_date(record.get('end_date')))
+    question.full_clean()
+    if question.end_date < question.start_date:
+        raise ValidationError("The end date is before the start date.")
+    texts = record.get('choices')
+    if not isinstance(texts, list) or not texts:
+        raise ValidationError("A poll needs at least one choice.")
+    choices = [Choice(text=text.get('text') if isinstance(text, dict) else text) for text in texts]
+    for choice in choices:
+        choice.clean_fields(exclude=['question'])
+    return question, choices
+
+
+class Command(BaseCommand):
+    """Stream polls from a file and bulk_create them a batch at a time, inside one transaction."""
+
+    help = ("Import polls and their choices from a CSV or JSON lines file ('-' for standard input). "
+            "The whole import is rolled back if any poll is invalid.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="The file to import, '-' for standard input.")
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help="The file format, by default guessed from the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Polls per bulk insert (default 1000).")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Validate the whole file and report every invalid poll without writing anything.")
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('csv' if options['file'].endswith('.csv') else 'jsonl')
+        reader = read_csv if file_format == 'csv' else read_jsonl
+        started = time.perf_counter()
+        if options['file'] == '-':
+            polls, choices, errors = self.load(reader(sys.stdin), options)
+        else:
+            with open(options['file'], newline='', encoding='utf-8') as lines:
+                polls, choices, errors = self.load(reader(lines), options)
+        elapsed = time.perf_counter() - started
+
+        for number, error in errors:
+            self.stderr.write(f"Line {number}: {' '.join(error.messages)}")
+        verb = "Validated" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {polls} poll(s) with {choices} choice(s) in {elapsed:.2f}s "
+            f"({polls / elapsed if elapsed else 0:.0f} polls/s)."
+        ))
+        if errors:
+            raise CommandError(f"{len(errors)} invalid poll(s) found.")
+
+    def load(self, records, options):
+        """
+        Validate the records and, unless this is a dry run, write them a batch at a time.
+
+        Returns:
+            A tuple of the poll count, the choice count and the (line number, error) pairs of invalid polls.
+        """
+        polls = choices = 0
+        errors = []
+        batch = []
+        with transaction.atomic():
+            for number, record in records:
+                try:
+                    batch.append(build_poll(record))
+                except ValidationError as error:
+                    if not options['dry_run']:
+                        raise CommandError(f"Line {number}: {' '.join(error.messages)} Nothing was imported.")
+                    errors.append((number, error))
+                    continue
+                polls += 1
+                choices += len(batch[-1][1])
+                if len(batch) >= options['batch_size']:
+                    self.write(batch, options)
+                    batch = []
+            self.write(batch, options)
+        if polls and not options['dry_run']:
+            invalidate_poll_listing()  # bulk_create sends no post_save signals.
+        return polls, choices, errors
+
+    def write(self, batch, options):
+        """Insert a batch of polls, then all of their choices."""
+        if options['dry_run'] or not batch:
+            return
+        Question.objects.bulk_create([question for question, _ in batch], batch_size=options['batch_size'])
+        all_choices = []
+        for question, choices in batch:
+            for choice in choices:
+                choice.question = question
+                all_choices.append(choice)
+        Choice.objects.bulk_create(all_choices, batch_size=options['batch_size'])
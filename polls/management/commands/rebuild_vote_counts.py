@@ -0,0 +1,48 @@
+"""Recompute the denormalized per-choice vote counters from the Vote table."""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from polls.models import Choice, ChoiceVoteShard, Vote
+
+
+class Command(BaseCommand):
+    """
+    Rebuild `Choice.votes` or, with --check, only report counters that drifted.
+
+    A choice's counter is `Choice.votes` plus its `ChoiceVoteShard` rows, a rebuild folds the shards back into
+    `Choice.votes`.
+
+    Polls whose Vote rows were compacted by `snapshot_results` are skipped, their snapshot holds the totals.
+    """
+
+    help = "Rebuild the per-choice vote counters from the Vote table and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drifted counters, exit with an error if any are found.")
+
+    def handle(self, *args, **options):
+        choices = Choice.objects.exclude(question__snapshot__votes_compacted=True)
+        drifted = list(
+            choices.with_vote_total()
+                   .annotate(actual=Count('vote'))
+                   .exclude(vote_total=F('actual'))
+                   .values_list('pk', 'question_id', 'vote_total', 'actual')
+                   .order_by('pk')
+        )
+        for pk, question_id, stored, actual in drifted:
+            self.stdout.write(f"Choice {pk} (question {question_id}): counter {stored}, actual {actual}")
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f"{len(drifted)} vote counter(s) drifted from the Vote table.")
+            self.stdout.write(self.style.SUCCESS("All vote counters match the Vote table."))
+            return
+
+        tally = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk')).values('total')
+        with transaction.atomic():
+            updated = choices.update(votes=Coalesce(Subquery(tally), 0))
+            ChoiceVoteShard.objects.filter(choice__in=choices).delete()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {updated} vote counter(s), {len(drifted)} had drifted."))
@@ -0,0 +1,50 @@
+"""Freeze the results of closed polls into snapshots and optionally compact away their Vote rows."""
+
+import datetime
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from polls import clock
+from polls.models import PollResultSnapshot, Question, Vote
+
+
+class Command(BaseCommand):
+    """Snapshot every settled closed poll, then compact or archive the votes of polls closed long ago."""
+
+    help = ("Freeze the results of closed polls into snapshots. With --compact-older-than, also delete the Vote rows "
+            "of polls closed more than that many days ago, keeping their totals in the snapshot.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compact-older-than', type=int, metavar='DAYS',
+                            help="Delete the Vote rows of snapshotted polls closed more than DAYS days ago.")
+        parser.add_argument('--archive', metavar='FILE',
+                            help="Append the compacted Vote rows to FILE as JSON lines before deleting them.")
+
+    def handle(self, *args, **options):
+        now = clock.now()
+        settled = now - datetime.timedelta(seconds=settings.POLLS_RESULT_SNAPSHOT_DELAY)
+        taken = 0
+        for question in Question.objects.closed(settled).filter(snapshot__isnull=True).order_by('pk').iterator():
+            PollResultSnapshot.take(question)
+            taken += 1
+        self.stdout.write(self.style.SUCCESS(f"Took {taken} result snapshot(s)."))
+
+        if options['compact_older_than'] is None:
+            return
+        cutoff = now - datetime.timedelta(days=options['compact_older_than'])
+        snapshots = PollResultSnapshot.objects.filter(votes_compacted=False, question__end_date__lt=cutoff)
+        polls = compacted = 0
+        for snapshot in snapshots.order_by('pk').iterator():
+            with transaction.atomic():
+                votes = Vote.objects.filter(question_id=snapshot.pk)
+                if options['archive']:
+                    with open(options['archive'], 'a') as archive:
+                        for row in votes.values('id', 'user_id', 'question_id', 'choice_id').iterator():
+                            archive.write(json.dumps(row) + "\n")
+                compacted += votes.delete()[0]
+                snapshot.votes_compacted = True
+                snapshot.save(update_fields=['votes_compacted'])
+            polls += 1
+        self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} vote(s) of {polls} poll(s)."))
@@ -0,0 +1,137 @@
+"""Middleware of the polls app."""
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.decorators import sync_and_async_middleware
+from . import clock, instrumentation, routers, staticfiles
+
+
+@sync_and_async_middleware
+def RequestClockMiddleware(get_response):
+    """Pin the polls clock once per request and expose the moment as `request.now`."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with clock.pinned() as request.now:
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with clock.pinned() as request.now:
+                return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def InstrumentationMiddleware(get_response):
+    """
+    Record each request's query count, database time, template time and latency per URL name.
+
+    Configured by `POLLS_INSTRUMENTATION`, see polls/instrumentation.py. Streaming responses only get their
+    `Server-Timing` header, their duration is set by the client rather than by the server's work.
+    """
+    options = settings.POLLS_INSTRUMENTATION
+    if not options['ENABLED']:
+        raise MiddlewareNotUsed
+    instrumentation.metrics.window = options['WINDOW']
+
+    def record(request, response, sample):
+        """Add the sample to the metrics, returning whether a dump of them is due."""
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = sample.server_timing()
+        if request.resolver_match is not None and not response.streaming:
+            instrumentation.metrics.add(request.resolver_match.view_name, sample)
+        return bool(options['DUMP_FILE']) and instrumentation.metrics.dump_due(options['DUMP_INTERVAL'])
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with instrumentation.recording() as sample:
+                response = await get_response(request)
+            if record(request, response, sample):
+                await sync_to_async(instrumentation.metrics.dump, thread_sensitive=False)(options['DUMP_FILE'])
+            return response
+    else:
+        def middleware(request):
+            with instrumentation.recording() as sample:
+                response = get_response(request)
+            if record(request, response, sample):
+                instrumentation.metrics.dump(options['DUMP_FILE'])
+            return response
+    return middleware
+
+
+@sync_and_async_middleware
+def ReplicaRoutingMiddleware(get_response):
+    """
+    Serve a request from the primary database when the replica may be missing data it depends on.
+
+    That is for writes, and for clients holding the sticky cookie set by their last successful write. Only used when
+    `POLLS_REPLICA['ALIAS']` is set.
+    """
+    options = settings.POLLS_REPLICA
+    if not options['ALIAS']:
+        raise MiddlewareNotUsed
+
+    def writes(request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS')
+
+    def stick(request, response):
+        if writes(request) and response.status_code < 400:
+            response.set_cookie(routers.STICKY_COOKIE, '1', max_age=max(1, round(options['LAG'])),
+                                httponly=True, samesite='Lax')
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not (writes(request) or routers.STICKY_COOKIE in request.COOKIES):
+                return await get_response(request)
+            with routers.use_primary():
+                return stick(request, await get_response(request))
+    else:
+        def middleware(request):
+            if not (writes(request) or routers.STICKY_COOKIE in request.COOKIES):
+                return get_response(request)
+            with routers.use_primary():
+                return stick(request, get_response(request))
+    return middleware
+
+
+@sync_and_async_middleware
+def StaticFilesMiddleware(get_response):
+    """
+    Serve the files `collectstatic` put in `STATIC_ROOT` before the request reaches the rest of the app.
+
+    Pre-compressed variants are sent to clients that accept them. Configured by `POLLS_STATIC`, see
+    polls/staticfiles.py.
+    """
+    options = settings.POLLS_STATIC
+    if not options['SERVE']:
+        raise MiddlewareNotUsed
+    files = staticfiles.CollectedFiles(settings.STATIC_ROOT, settings.STATIC_URL, options['MAX_AGE'])
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            found = files.lookup(request)
+            if found is None:
+                return await get_response(request)
+            path, content_type, headers = found
+            if path is None:
+                return HttpResponseNotModified(headers=headers)
+            # Read whole rather than streamed, ASGI servers would consume a file iterator synchronously anyway.
+            content = await sync_to_async(_read, thread_sensitive=False)(path)
+            return HttpResponse(content, content_type=content_type, headers=headers)
+    else:
+        def middleware(request):
+            found = files.lookup(request)
+            if found is None:
+                return get_response(request)
+            path, content_type, headers = found
+            if path is None:
+                return HttpResponseNotModified(headers=headers)
+            return FileResponse(open(path, 'rb'), content_type=content_type, headers=headers)
+    return middleware
+
+
+def _read(path):
+    with open(path, 'rb') as file:
+        return file.read()
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_vote_counters(apps, schema_editor):
+    """Fill the new counter column from the existing Vote rows."""
+    db = schema_editor.connection.alias
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    tally = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk')).values('total')
+    Choice.objects.using(db).update(votes=Coalesce(Subquery(tally), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_alter_vote_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='votes',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_vote_counters, migrations.RunPython.noop),
+    ]
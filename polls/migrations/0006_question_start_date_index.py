@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_choice_votes_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['start_date', 'id'], name='question_start_date_id_idx'),
+        ),
+    ]
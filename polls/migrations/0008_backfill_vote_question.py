@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:32
+
+from django.db import migrations
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_and_deduplicate(apps, schema_editor):
+    """Copy each vote's question from its choice, then keep only the latest vote per user and question."""
+    db = schema_editor.connection.alias
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    Vote.objects.using(db).update(question=Subquery(Choice.objects.filter(pk=OuterRef('choice_id')).values('question_id')[:1]))
+
+    duplicates = (Vote.objects.using(db).values('user', 'question')
+                                        .annotate(latest=Max('pk'), total=Count('pk'))
+                                        .filter(total__gt=1))
+    for duplicate in duplicates:
+        (Vote.objects.using(db).filter(user=duplicate['user'], question=duplicate['question'])
+                               .exclude(pk=duplicate['latest'])
+                               .delete())
+
+    tally = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk')).values('total')
+    Choice.objects.using(db).update(votes=Coalesce(Subquery(tally), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_vote_question'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_and_deduplicate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_vote_unique_user_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollResultSnapshot',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='polls.question')),
+                ('tally', models.JSONField()),
+                ('total_votes', models.IntegerField()),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+                ('votes_compacted', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import polls.clock
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0012_choice_vote_shards'),
+    ]
+
+    operations = [
+        # Added without a default first, so the votes already cast are left without a time instead of getting the
+        # time of the migration.
+        migrations.AddField(
+            model_name='vote',
+            name='created_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='created_at',
+            field=models.DateTimeField(default=polls.clock.now, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='VoteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('minute', 'minute'), ('hour', 'hour')], max_length=6)),
+                ('bucket', models.DateTimeField()),
+                ('votes', models.IntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='voterollup',
+            constraint=models.UniqueConstraint(fields=('question', 'period', 'bucket', 'choice'), name='unique_vote_rollup'),
+        ),
+    ]
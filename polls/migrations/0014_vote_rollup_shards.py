@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0013_vote_created_at_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='voterollup',
+            name='unique_vote_rollup',
+        ),
+        migrations.AddField(
+            model_name='voterollup',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='voterollup',
+            constraint=models.UniqueConstraint(fields=('question', 'period', 'bucket', 'choice', 'shard'), name='unique_vote_rollup'),
+        ),
+    ]
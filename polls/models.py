@@ -1,10 +1,48 @@
 """KU Poll's models."""
 
 import datetime
+import random
 
-from django.db import models
-from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from . import clock
+
+
+class QuestionQuerySet(models.QuerySet):
+    """
+    Filters polls by status in SQL, following the same rules as `Question.status`.
+
+    Each method takes an optional `now`, which defaults to the request's pinned clock.
+    """
+
+    def published(self, now=None):
+        """Polls whose start date has passed, whether open or closed."""
+        return self.filter(start_date__lte=now or clock.now())
+
+    def upcoming(self, now=None):
+        """Polls that have not started yet."""
+        return self.filter(start_date__gt=now or clock.now())
+
+    def open(self, now=None):
+        """Polls that accept votes."""
+        now = now or clock.now()
+        return self.filter(start_date__lte=now, end_date__gte=now)
+
+    def closed(self, now=None):
+        """Polls whose voting period is over."""
+        now = now or clock.now()
+        return self.filter(start_date__lte=now, end_date__lt=now)
+
+    def with_is_open(self, now=None):
+        """Annotate each poll with whether it accepts votes as `is_open`."""
+        now = now or clock.now()
+        return self.annotate(is_open=ExpressionWrapper(Q(start_date__lte=now, end_date__gte=now),
+                                                       output_field=BooleanField()))
 
 
 class Question(models.Model):
@@ -14,28 +52,101 @@ class Question(models.Model):
     It includes the question text, the start date, and the end date of the poll.
     """
 
+    UPCOMING = 'upcoming'
+    OPEN = 'open'
+    CLOSED = 'closed'
+
     text = models.CharField(max_length=500)
     start_date = models.DateTimeField('starting date')
     end_date = models.DateTimeField('ending date')
 
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date', 'id'], name='question_start_date_id_idx'),  # Backs index pagination
+            models.Index(fields=['end_date'], name='question_end_date_idx'),  # Backs open/closed and admin filters
+        ]
+
     def __str__(self):
         """Return the model's description."""
         return self.text
 
-    def was_published_recently(self):
+    def status(self, now=None):
+        """Return whether the poll is `UPCOMING`, `OPEN` or `CLOSED` at `now`, the request's clock by default."""
+        now = now or clock.now()
+        if now < self.start_date:
+            return self.UPCOMING
+        if now <= self.end_date:
+            return self.OPEN
+        return self.CLOSED
+
+    def was_published_recently(self, now=None):
         """Check if a poll was published recently."""
-        now = timezone.now()
+        now = now or clock.now()
         return now - datetime.timedelta(days=1) <= self.start_date <= now
 
-    def is_published(self):
+    def is_published(self, now=None):
         """Check if a poll is published."""
-        return timezone.now() >= self.start_date
+        return (now or clock.now()) >= self.start_date
 
-    def can_vote(self):
+    def can_vote(self, now=None):
         """Check if a poll is within the voting period."""
-        if self.is_published() and timezone.now() <= self.end_date:
-            return True
-        return False
+        return self.status(now) == self.OPEN
+
+    def results(self):
+        """
+        Tally the poll in a single aggregated query, or read it from its snapshot once the poll has closed.
+
+        With sharded vote counters the tally is read from the counters instead, through a cache that keeps it for
+        `POLLS_VOTE_COUNTER_CACHE_TIMEOUT` seconds.
+
+        Returns:
+            A tuple of the choices, each annotated with `num_votes` and `percentage`, and the total vote count.
+        """
+        snapshot = PollResultSnapshot.for_question(self)
+        if snapshot is not None:
+            return snapshot.results()
+        if settings.POLLS_VOTE_COUNTER_SHARDS > 1:
+            return tally(self._counted_choices())
+        return tally(list(self._results_queryset()))
+
+    async def aresults(self):
+        """Async version of `results`."""
+        if self.status() == self.CLOSED or settings.POLLS_VOTE_COUNTER_SHARDS > 1:
+            return await sync_to_async(self.results)()
+        return tally([choice async for choice in self._results_queryset().aiterator()])
+
+    def _counted_choices(self):
+        key = f"polls:question:{self.id}:counted-choices"
+        choices = cache.get(key)
+        if choices is None:
+            choices = list(self.choice_set.with_vote_total().order_by('pk'))
+            for choice in choices:
+                choice.num_votes = choice.vote_total
+            cache.set(key, choices, settings.POLLS_VOTE_COUNTER_CACHE_TIMEOUT)
+        return choices
+
+    def _results_queryset(self):
+        return self.choice_set.annotate(num_votes=Count('vote')).order_by('pk')
+
+
+def tally(choices):
+    """Add up choices annotated with `num_votes`, setting each one's `percentage` of the total."""
+    total = sum(choice.num_votes for choice in choices)
+    for choice in choices:
+        choice.percentage = choice.num_votes * 100 / total if total else 0
+    return choices, total
+
+
+class ChoiceQuerySet(models.QuerySet):
+    """Reads the vote counters of choices."""
+
+    def with_vote_total(self):
+        """Annotate each choice with `vote_total`, its counter plus whatever its counter shards hold."""
+        shards = (ChoiceVoteShard.objects.filter(choice=OuterRef('pk')).values('choice')
+                                         .annotate(total=Sum('votes')).values('total'))
+        return self.annotate(vote_total=F('votes') + Coalesce(Subquery(shards), 0))
 
 
 class Choice(models.Model):
@@ -43,27 +154,259 @@ class Choice(models.Model):
     This model specifies a singular choice of a poll.
 
     It includes the choice's text, the amount of votes the choice receives, and the question it is related to.
+    The vote tally is a denormalized counter kept in step with the Vote table by `polls.voting.cast_vote`,
+    use `manage.py rebuild_vote_counts` to recompute it. With `POLLS_VOTE_COUNTER_SHARDS` above one, votes are
+    counted in `ChoiceVoteShard` rows on top of `votes`, read the total with `Choice.objects.with_vote_total()`.
     """
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)  # Links to a Question model
     text = models.CharField(max_length=500)
+    votes = models.IntegerField(default=0, editable=False)  # Maintained counter of Vote rows
+
+    objects = ChoiceQuerySet.as_manager()
 
     def __str__(self):
         """Return the model's description."""
         return self.text
 
-    @property
-    def votes(self):
-        count = Vote.objects.filter(choice=self).count()
-        return count
+    @classmethod
+    def apply_vote_deltas(cls, deltas, shard_key=None):
+        """
+        Atomically add each amount of a {choice id: amount} mapping to that choice's counter in one UPDATE.
+
+        With sharded counters the amounts go to one of the choices' shards instead: the one `shard_key`, e.g. the
+        voter's id, maps to, or a random one.
+        """
+        if not deltas:
+            return 0
+        if settings.POLLS_VOTE_COUNTER_SHARDS > 1:
+            return ChoiceVoteShard.add(deltas, _shard(shard_key))
+        return cls.objects.filter(pk__in=deltas).update(votes=F('votes') + _changes(deltas, 'pk'))
+
+
+def _shard(shard_key):
+    """Return the counter shard `shard_key` maps to, a random one without it, or 0 when counters are not sharded."""
+    shards = settings.POLLS_VOTE_COUNTER_SHARDS
+    if shards <= 1:
+        return 0
+    return shard_key % shards if shard_key is not None else random.randrange(shards)
+
+
+def _changes(deltas, field):
+    """Return an expression picking each row's amount from a {key: amount} mapping, by the row's `field`."""
+    return models.Case(*(models.When(**{field: key}, then=amount) for key, amount in deltas.items()), default=0,
+                       output_field=models.IntegerField())
+
+
+class ChoiceVoteShard(models.Model):
+    """
+    One of the counter rows of a choice, in sharded counter mode.
+
+    Concurrent votes for the same choice update different shards instead of all waiting on the choice's row lock.
+    A choice's total is its `Choice.votes` plus the sum of its shards.
+    """
+
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='vote_shards')
+    shard = models.PositiveSmallIntegerField()
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'], name='unique_vote_shard_per_choice'),
+        ]
+
+    def __str__(self):
+        return f"Shard {self.shard} of {self.choice}"
+
+    @classmethod
+    def add(cls, deltas, shard):
+        """Add each amount of a {choice id: amount} mapping to that choice's row of `shard`, creating missing rows."""
+        rows = cls.objects.filter(choice_id__in=deltas, shard=shard)
+        existing = set(rows.values_list('choice_id', flat=True))
+        if existing:
+            rows.filter(choice_id__in=existing).update(votes=F('votes') + _changes(deltas, 'choice_id'))
+        for choice_id in deltas.keys() - existing:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(choice_id=choice_id, shard=shard, votes=deltas[choice_id])
+            except IntegrityError:  # Created by a concurrent vote meanwhile
+                rows.filter(choice_id=choice_id).update(votes=F('votes') + deltas[choice_id])
+        return len(deltas)
 
 
 class Vote(models.Model):
-    """Represents a vote made by a user."""
+    """
+    Represents a vote made by a user.
+
+    The question is denormalized from the choice so that a user's vote on a poll can be found, and kept unique,
+    through a single index. `created_at` is when the user first voted on the poll, changing the vote keeps it.
+    """
 
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=False, blank=False)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=clock.now, null=True, editable=False)  # Unknown for older votes
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'], name='unique_vote_per_user_question'),
+        ]
+        indexes = [
+            # Covers the (user, question) lookup of cast_vote without touching the table.
+            models.Index(fields=['user', 'question', 'choice'], name='vote_user_question_choice_idx'),
+        ]
 
     def __str__(self):
         return f"Voted by {self.user.username} for {self.choice.text}"
+
+    def save(self, *args, **kwargs):
+        """Fill in the question from the choice before saving."""
+        if self.question_id is None:
+            self.question_id = self.choice.question_id
+        super().save(*args, **kwargs)
+
+
+class VoteRollup(models.Model):
+    """
+    The net change of a choice's tally within one minute or one hour, for charts of a poll's votes over time.
+
+    Rows are added to by every vote, in the transaction recording it, so a poll's history is read from a few rows
+    per bucket and choice rather than from its Vote rows. A new vote adds one to its choice, a changed vote also
+    takes one from the previous choice, so the sum over a bucket's choices counts the first-time votes of that
+    bucket only, changed votes net to zero.
+
+    Like the vote counters, each bucket and choice has one row per counter shard when `POLLS_VOTE_COUNTER_SHARDS`
+    is above 1, so concurrent votes for the same choice do not all wait on the current minute's row lock.
+    """
+
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    PERIODS = {MINUTE: datetime.timedelta(minutes=1), HOUR: datetime.timedelta(hours=1)}
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    period = models.CharField(max_length=6, choices=[(MINUTE, "minute"), (HOUR, "hour")])
+    bucket = models.DateTimeField()  # Start of the minute or hour, in UTC
+    shard = models.PositiveSmallIntegerField(default=0)
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also backs reading a poll's buckets of one period in time order.
+            models.UniqueConstraint(fields=['question', 'period', 'bucket', 'choice', 'shard'],
+                                    name='unique_vote_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.votes:+} for {self.choice} in the {self.period} from {self.bucket}"
+
+    @classmethod
+    def bucket_start(cls, moment, period):
+        """Return the start of the bucket of `period` that `moment` falls in."""
+        moment = moment.astimezone(datetime.timezone.utc).replace(second=0, microsecond=0)
+        return moment.replace(minute=0) if period == cls.HOUR else moment
+
+    @classmethod
+    def add(cls, question_id, deltas, moment=None, shard_key=None):
+        """
+        Add a {choice id: change} mapping of a poll's tally at `moment`, now by default, to its buckets.
+
+        With sharded counters the changes go to the rows of the shard `shard_key` maps to, as in
+        `Choice.apply_vote_deltas`.
+        """
+        deltas = {pk: amount for pk, amount in deltas.items() if amount}
+        if not deltas:
+            return
+        buckets = {period: cls.bucket_start(moment or clock.now(), period) for period in cls.PERIODS}
+        shard = _shard(shard_key)
+        # Create the missing rows at zero, then add to all of them, two statements whatever races with them.
+        cls.objects.bulk_create([cls(question_id=question_id, choice_id=pk, period=period, bucket=bucket, shard=shard)
+                                 for period, bucket in buckets.items() for pk in deltas], ignore_conflicts=True)
+        rows = cls.objects.filter(Q(period=cls.MINUTE, bucket=buckets[cls.MINUTE])
+                                  | Q(period=cls.HOUR, bucket=buckets[cls.HOUR]),
+                                  question_id=question_id, choice_id__in=deltas, shard=shard)
+        rows.update(votes=F('votes') + _changes(deltas, 'choice_id'))
+
+    @classmethod
+    def series(cls, question_id, period, since=None, until=None):
+        """
+        Return a poll's buckets of `period` between `since` and `until`, in time order.
+
+        Returns:
+            A list of (bucket start, {choice id: change}) tuples, only of the buckets that saw votes.
+        """
+        rows = cls.objects.filter(question_id=question_id, period=period)
+        if since is not None:
+            rows = rows.filter(bucket__gte=cls.bucket_start(since, period))
+        if until is not None:
+            rows = rows.filter(bucket__lt=until)
+        rows = rows.values_list('bucket', 'choice_id').annotate(total=Sum('votes')).order_by('bucket', 'choice_id')
+        series = []
+        for bucket, pk, votes in rows:
+            if not series or series[-1][0] != bucket:
+                series.append((bucket, {}))
+            series[-1][1][pk] = votes
+        return series
+
+
+class PollResultSnapshot(models.Model):
+    """
+    The final results of a closed poll, frozen once so they are no longer counted from the Vote table.
+
+    Snapshots are taken on the first read of a poll's results after it has been closed for
+    `POLLS_RESULT_SNAPSHOT_DELAY` seconds, or in bulk by `manage.py snapshot_results`, which can also compact away
+    the Vote rows of old polls. `votes_compacted` records that the poll's Vote rows are gone and the snapshot is the
+    only record of its results.
+
+    A snapshot taken before the poll's current end date, because the poll was reopened since, is dropped and taken
+    again once the poll closes, unless its votes were compacted away.
+    """
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    tally = models.JSONField()  # {choice id: votes}, keys are strings as JSON objects require
+    total_votes = models.IntegerField()
+    taken_at = models.DateTimeField(auto_now_add=True)
+    votes_compacted = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Results of {self.question}"
+
+    @classmethod
+    def for_question(cls, question, now=None):
+        """
+        Return the snapshot of a poll's results, taking it if the poll has been closed long enough.
+
+        Returns:
+            The snapshot, or None while the poll's results can still change.
+        """
+        now = now or clock.now()
+        if question.status(now) != Question.CLOSED:
+            return None
+        snapshot = cls.objects.filter(question=question).first()
+        if snapshot is not None and (snapshot.taken_at >= question.end_date or snapshot.votes_compacted):
+            snapshot.question = question
+            return snapshot
+        if snapshot is not None:
+            cls.objects.filter(question=question, taken_at=snapshot.taken_at).delete()
+        if question.end_date < now - datetime.timedelta(seconds=settings.POLLS_RESULT_SNAPSHOT_DELAY):
+            return cls.take(question)
+        return None
+
+    @classmethod
+    def take(cls, question):
+        """Count a poll's votes into a new snapshot, or return the one a concurrent request took first."""
+        choices, total = tally(list(question._results_queryset()))
+        try:
+            with transaction.atomic():
+                return cls.objects.create(question=question, total_votes=total,
+                                          tally={str(choice.id): choice.num_votes for choice in choices})
+        except IntegrityError:  # Read it back from the primary, a replica may not have it yet
+            return cls.objects.using(router.db_for_write(cls)).get(question=question)
+
+    def results(self):
+        """Return the poll's choices and total vote count in the same shape as `Question.results`."""
+        choices = list(self.question.choice_set.order_by('pk'))
+        for choice in choices:
+            choice.num_votes = self.tally.get(str(choice.id), 0)
+        return tally(choices)
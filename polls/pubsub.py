@@ -0,0 +1,86 @@
+"""
+In-process publish/subscribe of vote tally changes, feeding the live results streams.
+
+Votes publish {choice id: change} deltas per poll once their transaction commits. Each subscriber accumulates the
+deltas it has not sent yet, so however many votes land in between, a stream emits at most one merged update per
+interval.
+"""
+
+import json
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    """The pending, merged tally changes of one poll for one listener."""
+
+    def __init__(self, question_id):
+        self.question_id = question_id
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def add(self, deltas):
+        """Merge `deltas` into the changes not yet taken."""
+        with self._lock:
+            for choice_id, change in deltas.items():
+                self._pending[choice_id] = self._pending.get(choice_id, 0) + change
+
+    def take(self):
+        """Return and clear the merged changes, dropping choices whose changes cancelled out."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return {choice_id: change for choice_id, change in pending.items() if change}
+
+
+class TallyBroker:
+    """Fans tally changes out to the subscriptions of each poll."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, question_id):
+        """Start listening to a poll's tally changes."""
+        subscription = Subscription(question_id)
+        with self._lock:
+            self._subscriptions[question_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop listening."""
+        with self._lock:
+            listeners = self._subscriptions.get(subscription.question_id)
+            if listeners is not None:
+                listeners.discard(subscription)
+                if not listeners:
+                    del self._subscriptions[subscription.question_id]
+
+    def publish(self, question_id, deltas):
+        """Hand a poll's tally changes to everyone listening to it."""
+        with self._lock:
+            listeners = list(self._subscriptions.get(question_id, ()))
+        for subscription in listeners:
+            subscription.add(deltas)
+
+
+broker = TallyBroker()
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_message(subscription, quiet_for, heartbeat):
+    """
+    Return the next message of a live results stream, if any is due.
+
+    That is a `tally` event with the changes merged since the last call, or a keep-alive comment once the stream
+    has been quiet for `heartbeat` seconds.
+    """
+    deltas = subscription.take()
+    if deltas:
+        return format_event('tally', {'deltas': deltas})
+    if quiet_for >= heartbeat:
+        return ": keep-alive\n\n"
+    return None
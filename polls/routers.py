@@ -0,0 +1,43 @@
+"""
+Routing of reads to a read replica.
+
+With `POLLS_REPLICA['ALIAS']` set, `ReplicaRouter` sends reads to the replica and writes to the primary. A request
+is served entirely from the primary (see `ReplicaRoutingMiddleware`) when it is itself a write, or when the client
+wrote within the last `LAG` seconds, so a voter sees their own vote.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+STICKY_COOKIE = 'polls_primary'
+
+_pinned = ContextVar('polls_primary_pinned', default=False)
+
+
+@contextmanager
+def use_primary():
+    """Route the reads of the block to the primary database."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    """Read from the replica unless the current request is pinned to the primary, always write to the primary."""
+
+    def db_for_read(self, model, **hints):
+        alias = settings.POLLS_REPLICA['ALIAS']
+        return 'default' if not alias or _pinned.get() else alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Both aliases hold the same data.
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'  # The replica is migrated by replication.
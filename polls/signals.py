@@ -0,0 +1,49 @@
+"""Signals of the polls app and their receivers."""
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from .database import apply_sqlite_pragmas
+from .instrumentation import instrument_connection
+from .listing import invalidate_poll_listing
+from .models import Choice, Question
+from .pubsub import broker
+from .versions import bump_edit_version, bump_vote_version
+
+# Sent with `question_id` and `deltas`, a {choice id: change} mapping, once the transaction recording votes commits.
+votes_changed = Signal()
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    """Invalidate the cached index listing and the poll's cached pages whenever a poll is added, edited or removed."""
+    invalidate_poll_listing()
+    bump_edit_version(instance.pk)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    """Invalidate the poll's cached pages whenever one of its choices is added, edited or removed."""
+    bump_edit_version(instance.question_id)
+
+
+@receiver(votes_changed)
+def publish_tally(sender, question_id, deltas, **kwargs):
+    """Push the tally changes to the live results streams and invalidate the poll's cached pages."""
+    bump_vote_version(question_id)
+    broker.publish(question_id, deltas)
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    """Apply the SQLite pragmas to every new SQLite connection."""
+    if connection.vendor == 'sqlite':
+        apply_sqlite_pragmas(connection)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """Time every new connection's queries into the request metrics."""
+    instrument_connection(connection)
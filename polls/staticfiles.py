@@ -0,0 +1,137 @@
+"""
+Production static files: content-hashed names, pre-compressed variants and far-future caching.
+
+`collectstatic` with `CompressedManifestStaticFilesStorage` copies every file into `STATIC_ROOT` under its own name
+and under a name carrying a hash of its content, then writes a gzip variant (and a brotli one, when the `brotli`
+package is installed) of each text file. `CollectedFiles` serves them from the app, see `StaticFilesMiddleware`: a
+hashed name never changes content, so browsers may keep it for a year without revalidating.
+"""
+
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def compressed_variants(content):
+    """Return {file suffix: content} of the compressions of `content` that make it smaller."""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return {suffix: data for suffix, data in variants.items() if len(data) < len(content)}
+
+
+def encoding_qualities(header):
+    """Return {content coding: q value} of an Accept-Encoding header, a coding with a malformed q value gets 0."""
+    qualities = {}
+    for part in header.split(','):
+        coding, *parameters = (item.strip() for item in part.split(';'))
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes compressed variants of the collected text files.
+
+    Until `collectstatic` has written a manifest, names are used as they are, so the app runs from a fresh checkout.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            with self.open(name) as file:
+                variants = compressed_variants(file.read())
+            for suffix, data in variants.items():
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(data))
+                yield name, name + suffix, True
+
+
+class CollectedFiles:
+    """
+    An index of the files `collectstatic` put in `root`, built once since they only change on deploy.
+
+    Files whose name is a hashed name of the manifest are marked immutable, other files may be cached `max_age`
+    seconds.
+    """
+
+    encodings = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, root, url, max_age):
+        self.url = url
+        self.max_age = max_age
+        self.files = {}
+        self.immutable = set()
+        if not root or not os.path.isdir(root):
+            return
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(directory, name)
+                self.files[posixpath.join(*os.path.relpath(path, root).split(os.sep))] = path
+        storage = CompressedManifestStaticFilesStorage(location=root)
+        self.immutable = set(storage.hashed_files.values())
+
+    def lookup(self, request):
+        """
+        Find the file a GET or HEAD request asks for.
+
+        Returns:
+            None when it is not a collected file, else a tuple of the path of the file or of its best compressed
+            variant the client accepts, its content type and the response headers, or of None, None and the
+            headers when the client's copy is still fresh.
+        """
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.url):
+            return None
+        name = request.path[len(self.url):]
+        path = self.files.get(name)
+        if path is None:
+            return None
+        mtime = os.stat(path).st_mtime
+        immutable = name in self.immutable
+        headers = {
+            'Cache-Control': (f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable
+                              else f'public, max-age={self.max_age}'),
+            'Last-Modified': http_date(mtime),
+            'Vary': 'Accept-Encoding',
+        }
+        if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), mtime):
+            return None, None, headers
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        qualities = encoding_qualities(request.headers.get('Accept-Encoding', ''))
+        for encoding, suffix in self.encodings:
+            if qualities.get(encoding, qualities.get('*', 0)) > 0 and name + suffix in self.files:
+                return self.files[name + suffix], content_type, {**headers, 'Content-Encoding': encoding}
+        return path, content_type, headers
@@ -2,3 +2,18 @@
 
 from .auth_tests import *
 from .question_tests import *
+from .vote_tests import *
+from .ingest_tests import *
+from .async_tests import *
+from .stream_tests import *
+from .snapshot_tests import *
+from .import_tests import *
+from .admin_tests import *
+from .instrumentation_tests import *
+from .benchmark_tests import *
+from .replica_tests import *
+from .api_tests import *
+from .shard_tests import *
+from .static_tests import *
+from .analytics_tests import *
+from .throttle_tests import *
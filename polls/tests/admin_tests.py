@@ -0,0 +1,79 @@
+"""Tests for the admin of the polls app."""
+
+import datetime
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..admin import EstimatedCountPaginator
+from ..models import Question, Vote
+
+
+class VoteAdminTests(TestCase):
+    """Contain tests for the admin changelists of large tables."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser(username="admin", password="Fat-Chance!"))
+        self.question = Question.objects.create(text="Poll", start_date=timezone.now() - datetime.timedelta(days=1),
+                                                end_date=timezone.now() + datetime.timedelta(days=1))
+        self.choices = [self.question.choice_set.create(text=f"Choice {i}") for i in range(2)]
+
+    def add_votes(self, count):
+        """Add `count` votes by new users."""
+        offset = Vote.objects.count()
+        users = User.objects.bulk_create(User(username=f"voter{offset + i}") for i in range(count))
+        Vote.objects.bulk_create(Vote(user=user, question=self.question, choice=self.choices[i % 2])
+                                 for i, user in enumerate(users))
+
+    def test_vote_changelist_query_count(self):
+        """Listing votes costs the same number of queries however many rows are shown."""
+        self.add_votes(2)
+        url = reverse('admin:polls_vote_changelist')
+        self.client.get(url)
+        # User (the session is cached), a single count and the votes with their relations.
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        self.add_votes(20)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, "voter")
+
+    def test_vote_changelist_by_question(self):
+        """A poll's votes are listed by its id, without loading every poll into a filter."""
+        self.add_votes(2)
+        other = Question.objects.create(text="Other", start_date=self.question.start_date,
+                                        end_date=self.question.end_date)
+        response = self.client.get(reverse('admin:polls_vote_changelist'), {'question': other.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_votes_are_read_only(self):
+        """Votes can be viewed but not added, changed or deleted, which would bypass the vote counters."""
+        self.add_votes(1)
+        vote = Vote.objects.get()
+        self.assertEqual(self.client.get(reverse('admin:polls_vote_add')).status_code, 403)
+        response = self.client.post(reverse('admin:polls_vote_change', args=(vote.id,)),
+                                    {'user': vote.user_id, 'question': vote.question_id, 'choice': self.choices[1].id})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.post(reverse('admin:polls_vote_delete', args=(vote.id,))).status_code, 403)
+        self.assertEqual(Vote.objects.get().choice, self.choices[0])
+        self.assertContains(self.client.get(reverse('admin:polls_vote_change', args=(vote.id,))), "voter0")
+
+    def test_question_change_page_shows_totals(self):
+        """A poll's change page lists its choices with their vote totals."""
+        self.add_votes(3)
+        for choice, votes in zip(self.choices, (2, 1)):
+            choice.votes = votes
+            choice.save()
+        response = self.client.get(reverse('admin:polls_question_change', args=(self.question.id,)))
+        self.assertContains(response, "Choice 1")
+        self.assertEqual([form.instance.votes for form in response.context['inline_admin_formsets'][0].formset],
+                         [2, 1])
+
+    def test_paginator_counts_small_tables_exactly(self):
+        """Outside PostgreSQL, or below the threshold, the paginator counts exactly."""
+        self.add_votes(3)
+        self.assertEqual(EstimatedCountPaginator(Vote.objects.order_by('pk'), 2).count, 3)
+        votes = Vote.objects.filter(choice=self.choices[0]).order_by('pk')
+        self.assertEqual(EstimatedCountPaginator(votes, 2).count, 2)
@@ -0,0 +1,98 @@
+"""Tests for the vote rollups and the vote history API."""
+
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .. import clock
+from ..ingest import apply_ballots
+from ..models import Vote, VoteRollup
+from ..voting import cast_vote
+from .fixtures import PollFixture
+
+
+class RollupFixture(PollFixture):
+    """Create three voters and a poll with two choices, voted on from three hours ago."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.hour = timezone.now().replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=3)
+        self.users = [User.objects.create_user(username=f"voter{i}") for i in range(3)]
+
+    def vote(self, user, choice, minutes):
+        """Cast a vote `minutes` after the start of the test's hour."""
+        with clock.pinned(self.hour + datetime.timedelta(minutes=minutes)):
+            cast_vote(self.users[user], self.question.id, self.choices[choice].id)
+
+
+class VoteRollupTests(RollupFixture, TestCase):
+    """Contain tests for keeping per-minute and per-hour vote counts as votes are cast."""
+
+    def test_created_at(self):
+        """A vote records when it was first cast, changing it keeps that time."""
+        self.vote(0, 0, 5)
+        self.vote(0, 1, 70)
+        self.assertEqual(Vote.objects.get().created_at, self.hour + datetime.timedelta(minutes=5))
+
+    def test_rollups(self):
+        """Votes add to the minute and hour of their choice, a change of vote moves one between choices."""
+        self.vote(0, 0, 5)
+        self.vote(1, 0, 5)
+        self.vote(2, 1, 30)
+        self.vote(0, 1, 70)
+        choice0, choice1 = (choice.id for choice in self.choices)
+        self.assertEqual(VoteRollup.series(self.question.id, VoteRollup.HOUR), [
+            (self.hour, {choice0: 2, choice1: 1}),
+            (self.hour + datetime.timedelta(hours=1), {choice0: -1, choice1: 1}),
+        ])
+        since = self.hour + datetime.timedelta(minutes=6)
+        minutes = VoteRollup.series(self.question.id, VoteRollup.MINUTE, since=since)
+        self.assertEqual([bucket.minute for bucket, _ in minutes], [30, 10])
+
+    def test_sharded(self):
+        """With sharded counters voters add to rows of their own shard, which the series sums back up."""
+        with self.settings(POLLS_VOTE_COUNTER_SHARDS=4):
+            for user in range(3):
+                self.vote(user, 0, 5)
+        self.assertEqual(VoteRollup.objects.filter(period=VoteRollup.MINUTE).count(), 3)
+        self.assertEqual(VoteRollup.series(self.question.id, VoteRollup.MINUTE),
+                         [(self.hour + datetime.timedelta(minutes=5), {self.choices[0].id: 3})])
+
+    def test_queued_ballots(self):
+        """Ballots written by the vote queue are rolled up too."""
+        with clock.pinned(self.hour):
+            apply_ballots([(user.pk, self.question.id, self.choices[1].id) for user in self.users])
+        self.assertEqual(VoteRollup.series(self.question.id, VoteRollup.HOUR), [(self.hour, {self.choices[1].id: 3})])
+
+
+class VoteHistoryApiTests(RollupFixture, TestCase):
+    """Contain tests for the endpoint of a poll's votes over time."""
+
+    def test_votes_per_hour(self):
+        """Each hour lists the poll's first-time votes and each choice's change, changed votes add no votes."""
+        self.vote(0, 0, 5)
+        self.vote(1, 0, 5)
+        self.vote(0, 1, 70)
+        url = reverse('polls:api_poll_votes', args=(self.question.id,))
+        # The poll, its choices and its rollups.
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        body = response.json()
+        self.assertEqual(body['period'], VoteRollup.HOUR)
+        self.assertEqual([bucket['votes'] for bucket in body['buckets']], [2, 0])
+        self.assertEqual(body['buckets'][1]['choices'], {str(self.choices[0].id): -1, str(self.choices[1].id): 1})
+
+    def test_parameters(self):
+        """Minute buckets can be asked for within a time range, invalid parameters are rejected."""
+        self.vote(0, 0, 5)
+        self.vote(1, 0, 20)
+        url = reverse('polls:api_poll_votes', args=(self.question.id,))
+        since = (self.hour + datetime.timedelta(minutes=10)).isoformat()
+        response = self.client.get(url, {'period': 'minute', 'since': since})
+        self.assertEqual([bucket['votes'] for bucket in response.json()['buckets']], [1])
+        self.assertEqual(self.client.get(url, {'period': 'day'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('polls:api_poll_votes', args=(1234,))).status_code, 404)
@@ -0,0 +1,80 @@
+"""Tests for the JSON results API."""
+
+import datetime
+import gzip
+import json
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question
+from ..voting import cast_vote
+
+
+class ResultsApiTests(TestCase):
+    """Contain tests for the poll listing and results endpoints."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        start = timezone.now() - datetime.timedelta(days=1)
+        self.polls = [Question.objects.create(text=f"Poll {i}", start_date=start,
+                                              end_date=start + datetime.timedelta(days=2)) for i in range(3)]
+        self.choices = [[poll.choice_set.create(text=f"Choice {i}") for i in range(2)] for poll in self.polls]
+        self.user = User.objects.create_user(username="voter")
+        cast_vote(self.user, self.polls[0].id, self.choices[0][1].id)
+
+    def test_poll_results(self):
+        """A poll's results list each choice's total, the poll's status and its version."""
+        response = self.client.get(reverse('polls:api_poll_results', args=(self.polls[0].id,)))
+        poll = response.json()['polls'][0]
+        self.assertEqual((poll['status'], poll['total_votes']), (Question.OPEN, 1))
+        self.assertEqual([choice['votes'] for choice in poll['choices']], [0, 1])
+        self.assertIn('version', poll)
+
+    def test_missing_poll(self):
+        """An unknown poll is a 404."""
+        self.assertEqual(self.client.get(reverse('polls:api_poll_results', args=(1234,))).status_code, 404)
+
+    def test_batch(self):
+        """The batch endpoint returns many polls in the order asked for, in a bounded number of queries."""
+        url = reverse('polls:api_results')
+        # The polls and all of their choices.
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'ids': f"{self.polls[2].id},{self.polls[0].id},999"})
+        self.assertEqual([poll['id'] for poll in response.json()['polls']], [self.polls[2].id, self.polls[0].id])
+        self.assertEqual(self.client.get(url, {'ids': "1,x"}).status_code, 400)
+        with self.settings(POLLS_API_MAX_BATCH=2):
+            self.assertEqual(self.client.get(url, {'ids': "1,2,3"}).status_code, 400)
+
+    def test_conditional_get(self):
+        """A client holding the current ETag gets a 304 without the choices being read, until a vote lands."""
+        url = reverse('polls:api_poll_results', args=(self.polls[0].id,))
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.user, self.polls[0].id, self.choices[0][0].id)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([choice['votes'] for choice in response.json()['polls'][0]['choices']], [1, 0])
+
+    def test_listing(self):
+        """The listing pages through published polls like the index page."""
+        response = self.client.get(reverse('polls:api_poll_list'), {'status': 'open'})
+        self.assertEqual(len(response.json()['polls']), 3)
+        self.assertIsNone(response.json()['next_cursor'])
+        response = self.client.get(reverse('polls:api_poll_list'), {'status': 'open'},
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_gzip(self):
+        """Large responses are compressed for clients that accept it."""
+        for i in range(30):
+            self.polls[0].choice_set.create(text=f"Another choice {i}")
+        response = self.client.get(reverse('polls:api_poll_results', args=(self.polls[0].id,)),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['polls'][0]['choices']), 32)
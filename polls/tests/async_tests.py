@@ -0,0 +1,80 @@
+"""Tests for the async views."""
+
+import datetime
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Question, Vote
+from .fixtures import PollFixture
+
+
+@override_settings(ROOT_URLCONF='polls.tests.async_urls')
+class AsyncViewTests(PollFixture, TestCase):
+    """Contain tests for the async index, results and vote views."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    async def test_index(self):
+        """The async index lists published polls."""
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, "Dummy")
+        self.assertEqual([poll.text for poll in response.context['latest_poll_list']], ["Dummy"])
+
+    async def test_results(self):
+        """The async results page shows the tally."""
+        await Vote.objects.acreate(user=self.user, question=self.question, choice=self.choice2)
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual([choice.num_votes for choice in response.context['choices']], [0, 1])
+        self.assertEqual(response.context['total_votes'], 1)
+
+    async def test_results_fragment_is_cached(self):
+        """A second visit takes the tally from the cached fragment instead of counting the votes again."""
+        url = reverse('polls:results', args=(self.question.id,))
+        await self.async_client.get(url)
+        with mock.patch.object(Question, '_results_queryset', side_effect=AssertionError("Tallied again")):
+            response = await self.async_client.get(url)
+        self.assertContains(response, "Choice 2")
+
+    async def test_closed_results_validators(self):
+        """A closed poll's async results page carries validators and is revalidated with a 304."""
+        start = timezone.now() - datetime.timedelta(days=5)
+        poll = await Question.objects.acreate(text="Closed", start_date=start,
+                                              end_date=start + datetime.timedelta(days=1))
+        url = reverse('polls:results', args=(poll.id,))
+        response = await self.async_client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_results_missing_poll(self):
+        """The async results page of an unknown poll is a 404."""
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id + 1,)))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_vote(self):
+        """The async vote view records the vote and redirects to the results."""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        response = await self.async_client.post(url, {'choice': self.choice1.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        self.assertEqual(await Vote.objects.filter(user=self.user, choice=self.choice1).acount(), 1)
+
+    async def test_vote_without_choice(self):
+        """A ballot without a choice shows the poll's choices again with an error."""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.post(reverse('polls:vote', args=(self.question.id,)))
+        self.assertContains(response, "You didn&#x27;t select a choice.")
+        self.assertContains(response, "Choice 2")
+
+    async def test_vote_requires_login(self):
+        """Anonymous voters are sent to the login page."""
+        response = await self.async_client.post(reverse('polls:vote', args=(self.question.id,)),
+                                                {'choice': self.choice1.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
@@ -0,0 +1,9 @@
+"""URLconf routing the polls app to its async views, for the async view tests."""
+
+from django.urls import include, path
+from ..urls import build_urlpatterns
+
+urlpatterns = [
+    path('accounts/', include('django.contrib.auth.urls')),
+    path('polls/', include((build_urlpatterns(use_async_views=True), 'polls'))),
+]
@@ -1,8 +1,15 @@
 """Tests for authentication system."""
 
-from django.test import TestCase
+import datetime
+from unittest import mock
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from ..models import Question
 
 
 class UserAuthTest(TestCase):
@@ -31,4 +38,29 @@ class UserAuthTest(TestCase):
         response = self.client.post(login_url, form_data)
         self.assertEqual(302, response.status_code)
         # should redirect us to the polls index page ("polls:index")
-        self.assertRedirects(response, reverse("polls:index"))
\ No newline at end of file
+        self.assertRedirects(response, reverse("polls:index"))
+
+    def test_signup_logs_in(self):
+        """A new user is logged in right after signing up, their password hashed only once."""
+        form_data = {"username": "newcomer", "password1": "Fat-Chance!2", "password2": "Fat-Chance!2"}
+        with mock.patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.encode',
+                        autospec=True, side_effect=PBKDF2PasswordHasher.encode) as encode:
+            response = self.client.post(reverse("signup"), form_data)
+        self.assertEqual(302, response.status_code)
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(int(self.client.session['_auth_user_id']), User.objects.get(username="newcomer").pk)
+
+
+class AnonymousSessionTest(TestCase):
+    """Contain tests for keeping anonymous traffic away from the session store."""
+
+    def test_anonymous_reads_skip_sessions(self):
+        """Anonymous visits to the index and results pages never query the session table."""
+        question = Question.objects.create(text="Poll", start_date=timezone.now() - datetime.timedelta(days=1),
+                                           end_date=timezone.now() + datetime.timedelta(days=1))
+        for url in (reverse('polls:index'), reverse('polls:results', args=(question.id,))):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+            self.assertNotIn('sessionid', response.cookies)
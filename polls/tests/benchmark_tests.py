@@ -0,0 +1,38 @@
+"""Tests for the benchmark helpers."""
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from ..benchmarks import create_fixture, summarize
+from ..models import Choice, Vote
+
+
+class BenchmarkFixtureTests(TestCase):
+    """Contain tests for the generated benchmark data."""
+
+    def test_fixture_shape(self):
+        """The fixture has the requested polls, choices and votes, with one vote per voter and poll."""
+        questions, users = create_fixture(polls=3, choices=4, votes=10)
+        self.assertEqual(len(questions), 3)
+        self.assertEqual(len(users), 4)
+        self.assertEqual(Choice.objects.count(), 12)
+        self.assertEqual(Vote.objects.count(), 10)
+        self.assertTrue(all(question.can_vote() for question in questions))
+
+    def test_counters_match_votes(self):
+        """The vote counters agree with the generated votes."""
+        create_fixture(polls=2, choices=3, votes=25)
+        for choice in Choice.objects.all():
+            self.assertEqual(choice.votes, Vote.objects.filter(choice=choice).count())
+
+    def test_fixture_is_reproducible(self):
+        """The same seed picks the same choices."""
+        create_fixture(polls=2, choices=5, votes=20, seed=7)
+        first = list(Vote.objects.order_by('pk').values_list('choice__text', flat=True))
+        User.objects.all().delete()
+        create_fixture(polls=2, choices=5, votes=20, seed=7)
+        self.assertEqual(list(Vote.objects.order_by('pk').values_list('choice__text', flat=True)), first)
+
+    def test_summarize(self):
+        """Samples are summarized into latency percentiles and queries per request."""
+        stats = summarize([(0.001 * i, 2) for i in range(1, 101)])
+        self.assertEqual((stats['requests'], stats['p50_ms'], stats['queries_per_request']), (100, 50.5, 2))
@@ -0,0 +1,23 @@
+"""Test data shared by KU Poll's test cases."""
+
+import datetime
+from django.contrib.auth.models import User
+from django.utils import timezone
+from ..models import Question
+
+
+def create_poll(text, start, end):
+    """Create a poll with the given `text` and days offset."""
+    return Question.objects.create(text=text, start_date=start, end_date=end)
+
+
+class PollFixture:
+    """Create a voter and a poll open since yesterday with two choices."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="voter", password="Fat-Chance!")
+        start = timezone.now() - datetime.timedelta(days=1)
+        self.question = create_poll("Dummy", start=start, end=start + datetime.timedelta(days=2))
+        self.choices = [self.question.choice_set.create(text=f"Choice {i}") for i in (1, 2)]
+        self.choice1, self.choice2 = self.choices
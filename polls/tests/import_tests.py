@@ -0,0 +1,97 @@
+"""Tests for the bulk import and export commands."""
+
+import csv
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from ..models import Choice, Question, Vote
+
+
+class ImportExportTests(TestCase):
+    """Contain tests for `import_polls` and `export_results`."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, lines):
+        """Write `lines` to a file in the temporary directory and return its path."""
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            file.write("\n".join(lines) + "\n")
+        return path
+
+    def poll(self, text, *choices):
+        """Return a JSON line describing an open poll."""
+        return json.dumps({'question': text, 'start_date': '2021-08-30T09:30:00Z',
+                           'end_date': '2030-01-01T00:00:00', 'choices': list(choices)})
+
+    def test_import_jsonl(self):
+        """Polls and their choices are created in batches."""
+        path = self.write("polls.jsonl", [self.poll(f"Poll {i}", "Yes", "No") for i in range(5)])
+        call_command('import_polls', path, '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(Question.objects.count(), 5)
+        self.assertEqual(list(Question.objects.get(text="Poll 3").choice_set.values_list('text', flat=True)),
+                         ["Yes", "No"])
+        self.assertTrue(timezone.is_aware(Question.objects.first().end_date))
+
+    def test_import_csv(self):
+        """Consecutive CSV rows of the same poll become its choices."""
+        path = self.write("polls.csv", ["question,start_date,end_date,choice",
+                                        "A,2021-08-30 09:30,2030-01-01 00:00,One",
+                                        "A,2021-08-30 09:30,2030-01-01 00:00,Two",
+                                        "B,2021-08-30 09:30,2030-01-01 00:00,Three"])
+        call_command('import_polls', path, stdout=StringIO())
+        self.assertEqual(Choice.objects.filter(question__text="A").count(), 2)
+        self.assertEqual(Choice.objects.filter(question__text="B").count(), 1)
+
+    def test_invalid_poll_aborts_import(self):
+        """One invalid poll rolls the whole import back."""
+        path = self.write("polls.jsonl", [self.poll("Good", "Yes"), self.poll("No choices")])
+        with self.assertRaisesMessage(CommandError, "Line 2"):
+            call_command('import_polls', path, '--batch-size', '1', stdout=StringIO())
+        self.assertFalse(Question.objects.exists())
+
+    def test_dry_run(self):
+        """A dry run reports every invalid poll and writes nothing."""
+        path = self.write("polls.jsonl", ["{broken", self.poll("Good", "Yes"), self.poll("", "Yes")])
+        stderr = StringIO()
+        with self.assertRaisesMessage(CommandError, "2 invalid poll(s)"):
+            call_command('import_polls', path, '--dry-run', stdout=StringIO(), stderr=stderr)
+        self.assertIn("Line 1: Invalid JSON", stderr.getvalue())
+        self.assertIn("Line 3:", stderr.getvalue())
+        self.assertFalse(Question.objects.exists())
+
+    def test_export_round_trip(self):
+        """Exported results import back as the same polls."""
+        path = self.write("polls.jsonl", [self.poll("Poll", "Yes", "No")])
+        call_command('import_polls', path, stdout=StringIO())
+        for file_format in ('jsonl', 'csv'):
+            exported = os.path.join(self.directory, f"export.{file_format}")
+            call_command('export_results', '--format', file_format, '--output', exported, stderr=StringIO())
+            call_command('import_polls', exported, stdout=StringIO())
+        # The JSON lines export holds the imported poll, the CSV export also the poll imported back from it.
+        self.assertEqual(Question.objects.filter(text="Poll").count(), 4)
+        self.assertEqual(Choice.objects.filter(text="No").count(), 4)
+
+    def test_export_votes(self):
+        """Every vote is exported with its voter."""
+        question = Question.objects.create(text="Poll", start_date=timezone.now() - datetime.timedelta(days=1),
+                                           end_date=timezone.now() + datetime.timedelta(days=1))
+        choice = question.choice_set.create(text="Yes")
+        vote = Vote.objects.create(user=User.objects.create_user(username="voter"), choice=choice)
+        output = StringIO()
+        call_command('export_results', '--votes', '--format', 'csv', '--chunk-size', '1', stdout=output,
+                     stderr=StringIO())
+        self.assertEqual(list(csv.DictReader(StringIO(output.getvalue()))),
+                         [{'vote_id': str(vote.id), 'question_id': str(question.id), 'choice_id': str(choice.id),
+                           'user': "voter"}])
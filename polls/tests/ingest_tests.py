@@ -0,0 +1,143 @@
+"""Tests for the write-behind vote queue."""
+
+import builtins
+import json
+import os
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from ..ingest import VoteQueue
+from ..models import Choice, Vote
+from ..voting import cast_vote
+from .fixtures import PollFixture
+
+
+def make_queue(**kwargs):
+    """Create a queue that is flushed by hand instead of from the background thread."""
+    queue = VoteQueue(flush_interval=3600, **kwargs)
+    queue.start = lambda: None
+    return queue
+
+
+class VoteQueueFixture(PollFixture):
+    """Add a second voter and a queue to the poll fixture."""
+
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username="other", password="Fat-Chance!")
+        self.queue = make_queue()
+
+    def tallies(self):
+        """Return the counters of both choices."""
+        return list(Choice.objects.order_by('pk').values_list('votes', flat=True))
+
+
+class VoteQueueTests(VoteQueueFixture, TestCase):
+    """Contain tests for queuing and flushing ballots."""
+
+    def test_last_ballot_wins(self):
+        """Ballots of the same user on the same poll coalesce to the last one."""
+        self.queue.submit(self.user.id, self.question.id, self.choice1.id)
+        self.queue.submit(self.other.id, self.question.id, self.choice1.id)
+        self.queue.submit(self.user.id, self.question.id, self.choice2.id)
+        self.assertEqual(self.queue.flush(), 2)
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.choice2)
+        self.assertEqual(self.tallies(), [1, 1])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_flush_changes_existing_vote(self):
+        """A queued ballot replaces a vote that is already in the database."""
+        cast_vote(self.user, self.question.id, self.choice1.id)
+        self.queue.submit(self.user.id, self.question.id, self.choice2.id)
+        self.queue.flush()
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.choice2)
+        self.assertEqual(self.tallies(), [0, 1])
+
+    def test_large_backlog(self):
+        """A backlog of many more ballots than a batch is looked up chunk by chunk and written whole."""
+        users = User.objects.bulk_create(User(username=f"voter{i}") for i in range(1500))
+        cast_vote(users[0], self.question.id, self.choice1.id)
+        for user in users:
+            self.queue.submit(user.id, self.question.id, self.choice2.id)
+        self.assertEqual(self.queue.flush(), 1500)
+        self.assertEqual(self.tallies(), [0, 1500])
+
+    def test_journal_replayed(self):
+        """Journaled ballots that were never flushed are recovered by the next queue."""
+        with tempfile.TemporaryDirectory() as directory:
+            journal = os.path.join(directory, 'votes.jsonl')
+            crashed = make_queue(durability='journal', journal=journal)
+            crashed.submit(self.user.id, self.question.id, self.choice1.id)
+            crashed.close()
+            recovered = make_queue(durability='fsync', journal=journal)
+            self.assertEqual(len(recovered), 1)
+            recovered.flush()
+            self.assertFalse(os.path.exists(recovered.flushing_journal))
+            recovered.close()
+            self.assertEqual(len(make_queue(durability='journal', journal=journal)), 0)
+        self.assertEqual(self.tallies(), [1, 0])
+
+    def test_journals_per_process(self):
+        """Each process journals to its own file, and the journals of processes that are gone are taken over."""
+        with tempfile.TemporaryDirectory() as directory:
+            journal = os.path.join(directory, 'votes.jsonl')
+            queue = make_queue(durability='journal', journal=journal)
+            self.assertEqual(queue.journal, os.path.join(directory, f'votes.{os.getpid()}.jsonl'))
+            with self.assertRaises(RuntimeError):
+                make_queue(durability='journal', journal=journal)
+            queue.close()
+
+            alive, gone = (os.path.join(directory, f'votes.{pid}.jsonl') for pid in (1, 2))
+            for path, choice in ((alive, self.choice1), (gone + '.flushing', self.choice1), (gone, self.choice2)):
+                with open(path, 'w') as file:
+                    file.write(json.dumps([self.user.id, self.question.id, choice.id]) + '\n')
+            import fcntl
+            with open(alive + '.lock', 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                queue = make_queue(durability='journal', journal=journal)
+            self.assertEqual(len(queue), 2)
+            self.assertTrue(os.path.exists(alive))
+            self.assertFalse(os.path.exists(gone) or os.path.exists(gone + '.flushing'))
+            queue.flush()
+            queue.close()
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.choice2)
+
+    def test_journal_needs_file_locks(self):
+        """Without fcntl a journaled queue is a configuration error, a memory queue still works."""
+        real_import = builtins.__import__
+
+        def import_without_fcntl(name, *args, **kwargs):
+            if name == 'fcntl':
+                raise ImportError(name)
+            return real_import(name, *args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as directory, mock.patch('builtins.__import__', import_without_fcntl):
+            with self.assertRaises(ImproperlyConfigured):
+                make_queue(durability='journal', journal=os.path.join(directory, 'votes.jsonl'))
+            make_queue().submit(self.user.id, self.question.id, self.choice1.id)
+
+    @override_settings(POLLS_VOTE_INGESTION='queued')
+    def test_queued_vote_view(self):
+        """In queued mode the vote view only queues the ballot."""
+        self.client.force_login(self.user)
+        with mock.patch('polls.voting.get_vote_queue', return_value=self.queue):
+            response = self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.choice1.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.assertFalse(Vote.objects.exists())
+        self.queue.flush()
+        self.assertEqual(self.tallies(), [1, 0])
+
+
+class VoteQueueCommitTests(VoteQueueFixture, TransactionTestCase):
+    """Contain tests that need the flush transaction to really commit, which is when foreign keys are checked."""
+
+    def test_bad_ballot_does_not_block_queue(self):
+        """A ballot the database refuses is dropped and the rest of the batch is still written."""
+        self.queue.submit(self.user.id, self.question.id, self.choice1.id)
+        self.queue.submit(12345, self.question.id, self.choice1.id)
+        with self.assertLogs('polls.ingest', 'WARNING'):
+            self.assertEqual(self.queue.flush(), 1)
+        self.assertEqual(self.tallies(), [1, 0])
@@ -0,0 +1,93 @@
+"""Tests for the per-view request metrics."""
+
+import datetime
+import json
+import os
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..instrumentation import Metrics, Sample
+from ..models import Question
+
+INSTRUMENTATION = {'ENABLED': True, 'SERVER_TIMING': True, 'WINDOW': 100, 'DUMP_FILE': '', 'DUMP_INTERVAL': 60.0,
+                   'METRICS_ENDPOINT': True}
+
+
+@override_settings(POLLS_INSTRUMENTATION=INSTRUMENTATION)
+class InstrumentationMiddlewareTests(TestCase):
+    """Contain tests for recording requests."""
+
+    def setUp(self):
+        super().setUp()
+        self.metrics = Metrics()
+        patcher = mock.patch('polls.instrumentation.metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.question = Question.objects.create(text="Poll", start_date=timezone.now() - datetime.timedelta(days=1),
+                                                end_date=timezone.now() + datetime.timedelta(days=1))
+        self.question.choice_set.create(text="Choice")
+
+    def test_server_timing(self):
+        """Responses carry their database, template and total time."""
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, '
+                                                    r'total;dur=[\d.]+$')
+
+    def test_samples_per_view(self):
+        """Requests are aggregated under their URL name, with their query counts."""
+        url = reverse('polls:results', args=(self.question.id,))
+        for _ in range(3):
+            self.client.get(url)
+        summary = self.metrics.summary()['polls:results']
+        self.assertEqual(summary['count'], 3)
+        self.assertGreater(summary['queries']['p50'], 0)
+        self.assertGreater(summary['template']['sum'], 0)
+        self.assertGreaterEqual(summary['total']['p99'], summary['db']['p99'])
+
+    def test_prometheus_endpoint(self):
+        """The metrics endpoint serves the summaries in the Prometheus text format."""
+        self.client.get(reverse('polls:results', args=(self.question.id,)))
+        response = self.client.get(reverse('polls:metrics'))
+        self.assertContains(response, '# TYPE polls_request_duration_seconds summary')
+        self.assertContains(response, 'polls_request_queries{view="polls:results",quantile="0.99"}')
+        self.assertContains(response, 'polls_request_duration_seconds_count{view="polls:results"} 1')
+
+    @override_settings(ROOT_URLCONF='polls.tests.async_urls')
+    async def test_async_view_queries(self):
+        """The queries of async views, run in other threads, are counted too."""
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+        self.assertGreater(self.metrics.summary()['polls:results']['queries']['p50'], 0)
+
+    @override_settings(POLLS_INSTRUMENTATION={**INSTRUMENTATION, 'METRICS_ENDPOINT': False})
+    def test_prometheus_endpoint_disabled(self):
+        """The metrics endpoint is not found unless enabled."""
+        self.assertEqual(self.client.get(reverse('polls:metrics')).status_code, 404)
+
+    def test_dump(self):
+        """The summaries are dumped to the configured file once the interval has passed."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.json")
+            with self.settings(POLLS_INSTRUMENTATION={**INSTRUMENTATION, 'DUMP_FILE': path, 'DUMP_INTERVAL': 0}):
+                self.client.get(reverse('polls:results', args=(self.question.id,)))
+            with open(path) as dump:
+                self.assertEqual(json.load(dump)['polls:results']['count'], 1)
+
+
+class MetricsTests(TestCase):
+    """Contain tests for aggregating samples."""
+
+    def test_quantiles_over_window(self):
+        """Quantiles cover the latest samples only, counts and sums every sample."""
+        metrics = Metrics(window=100)
+        for i in range(200):
+            sample = Sample()
+            sample.total = float(i)
+            metrics.add('polls:vote', sample)
+        summary = metrics.summary()['polls:vote']
+        self.assertEqual(summary['count'], 200)
+        self.assertEqual(summary['total']['sum'], sum(range(200)))
+        self.assertEqual(summary['total']['p50'], 149.5)
+        self.assertAlmostEqual(summary['total']['p99'], 198.01)
@@ -1,10 +1,20 @@
 """KU Poll's test cases."""
 
+import calendar
 import datetime
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
-from ..models import Question
+from django.utils.http import http_date
+from django.contrib.auth.models import User
+from .. import clock
+from ..checks import check_version_cache
+from ..listing import INDEX_VERSION_KEY, get_poll_page
+from ..models import Choice, Question, Vote
+from ..signals import votes_changed
+from .fixtures import create_poll
 
 
 class QuestionModelTests(TestCase):
@@ -66,30 +76,59 @@ class QuestionModelTests(TestCase):
         published_poll = Question(start_date=time_start, end_date=time_end)
         self.assertIs(published_poll.can_vote(), False)
 
+    def test_status(self):
+        """A poll is upcoming before its start date, open until its end date and closed after it."""
+        now = timezone.now()
+        poll = Question(start_date=now, end_date=now + datetime.timedelta(days=1))
+        self.assertEqual(poll.status(now - datetime.timedelta(seconds=1)), Question.UPCOMING)
+        self.assertEqual(poll.status(now), Question.OPEN)
+        self.assertEqual(poll.status(poll.end_date), Question.OPEN)
+        self.assertEqual(poll.status(poll.end_date + datetime.timedelta(seconds=1)), Question.CLOSED)
 
-def create_poll(text, start, end):
-    """Create a poll with the given `text` and days offset."""
-    return Question.objects.create(text=text, start_date=start, end_date=end)
+    def test_status_uses_pinned_clock(self):
+        """Status checks read the pinned clock when no time is given."""
+        now = timezone.now()
+        poll = Question(start_date=now + datetime.timedelta(days=1), end_date=now + datetime.timedelta(days=2))
+        with clock.pinned(now + datetime.timedelta(days=1, hours=1)):
+            self.assertIs(poll.can_vote(), True)
+            self.assertIs(poll.was_published_recently(), True)
+        self.assertIs(poll.can_vote(), False)
+
+    def test_status_querysets(self):
+        """The queryset filters agree with the status of each poll."""
+        now = timezone.now()
+        create_poll("Upcoming", start=now + datetime.timedelta(days=1), end=now + datetime.timedelta(days=2))
+        create_poll("Open", start=now - datetime.timedelta(days=1), end=now + datetime.timedelta(days=1))
+        create_poll("Closed", start=now - datetime.timedelta(days=2), end=now - datetime.timedelta(days=1))
+        for status in (Question.UPCOMING, Question.OPEN, Question.CLOSED):
+            polls = getattr(Question.objects, status)(now)
+            self.assertEqual([(poll.text, poll.status(now)) for poll in polls], [(status.capitalize(), status)])
+        self.assertEqual(Question.objects.published(now).count(), 2)
 
 
 class QuestionIndexViewTests(TestCase):
     """Contain tests for the Index view."""
 
+    def setUp(self):
+        super().setUp()
+        cache.clear()  # Rolled back test data does not fire the signals that invalidate the listing.
+
     def test_no_polls(self):
         """If no polls exist, an appropriate message will be displayed."""
         response = self.client.get(reverse('polls:index'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "No polls are available.")
-        self.assertQuerysetEqual(response.context['latest_poll_list'], [])
+        self.assertQuerySetEqual(response.context['latest_poll_list'], [])
 
     def test_past_poll(self):
         """Polls with a start_date in the past are displayed on the index page."""
         create_poll("Past poll.", start=timezone.now() - datetime.timedelta(days=30),
                     end=timezone.now() - datetime.timedelta(days=10))
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_poll_list'],
-            ['<Question: Past poll.>']
+            ['<Question: Past poll.>'],
+            transform=repr
         )
 
     def test_future_poll(self):
@@ -98,7 +137,7 @@ class QuestionIndexViewTests(TestCase):
                     end=timezone.now() - datetime.timedelta(days=40))
         response = self.client.get(reverse('polls:index'))
         self.assertContains(response, "No polls are available.")
-        self.assertQuerysetEqual(response.context['latest_poll_list'], [])
+        self.assertQuerySetEqual(response.context['latest_poll_list'], [])
 
     def test_future_poll_and_past_poll(self):
         """Even if both past and future polls exist, only past polls are displayed."""
@@ -107,9 +146,10 @@ class QuestionIndexViewTests(TestCase):
         create_poll("Past poll.", start=timezone.now() + datetime.timedelta(days=30),
                     end=timezone.now() - datetime.timedelta(days=40))
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_poll_list'],
-            ['<Question: Past poll.>']
+            ['<Question: Past poll.>'],
+            transform=repr
         )
 
     def test_two_past_polls(self):
@@ -120,11 +160,81 @@ class QuestionIndexViewTests(TestCase):
                     end=timezone.now() - datetime.timedelta(days=5))
         create_poll("Present Poll.", start=timezone.now(), end=timezone.now() + datetime.timedelta(days=5))
         response = self.client.get(reverse('polls:index'))
-        self.assertQuerysetEqual(
+        self.assertQuerySetEqual(
             response.context['latest_poll_list'],
-            ['<Question: Present Poll.>', '<Question: Past poll 2.>', '<Question: Past poll 1.>']
+            ['<Question: Present Poll.>', '<Question: Past poll 2.>', '<Question: Past poll 1.>'],
+            transform=repr
         )
 
+    def test_request_clock(self):
+        """Each request pins one moment as the clock."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertLessEqual(response.wsgi_request.now, timezone.now())
+
+    def test_listing_is_cached(self):
+        """A second visit is served from the cache without touching the database."""
+        create_poll("Past poll.", start=timezone.now() - datetime.timedelta(days=30),
+                    end=timezone.now() - datetime.timedelta(days=10))
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('polls:index'))
+
+    def test_listing_invalidated_on_save(self):
+        """Saving a poll refreshes the cached listing."""
+        poll = create_poll("Old text.", start=timezone.now() - datetime.timedelta(days=30),
+                           end=timezone.now() + datetime.timedelta(days=10))
+        self.client.get(reverse('polls:index'))
+        poll.text = "New text."
+        poll.save()
+        self.assertContains(self.client.get(reverse('polls:index')), "New text.")
+
+    def test_listing_token_is_shared(self):
+        """The listing token lives in the cache every worker process shares, so any of them can move it."""
+        self.client.get(reverse('polls:index'))
+        version = caches['versions'].get(INDEX_VERSION_KEY)
+        self.assertIsNotNone(version)
+        create_poll("New poll.", start=timezone.now(), end=timezone.now() + datetime.timedelta(days=1))
+        self.assertNotEqual(caches['versions'].get(INDEX_VERSION_KEY), version)
+
+    def test_listing_expires_at_next_boundary(self):
+        """A cached listing is rebuilt once a poll opens, even though nothing was saved."""
+        now = timezone.now()
+        create_poll("Soon poll.", start=now + datetime.timedelta(hours=1), end=now + datetime.timedelta(days=1))
+        self.assertEqual(get_poll_page(now=now), ([], None))
+        later = now + datetime.timedelta(hours=2)
+        self.assertEqual([poll.text for poll in get_poll_page(now=later)[0]], ["Soon poll."])
+
+    @override_settings(POLLS_INDEX_PAGE_SIZE=2)
+    def test_keyset_pagination(self):
+        """The cursor of each page leads to the next older polls, ties on start_date broken by id."""
+        start = timezone.now() - datetime.timedelta(days=1)
+        for i in range(5):
+            create_poll(f"Poll {i}.", start=start, end=start + datetime.timedelta(days=i))
+        texts = []
+        response = self.client.get(reverse('polls:index'))
+        while True:
+            texts += [poll.text for poll in response.context['latest_poll_list']]
+            if response.context['next_cursor'] is None:
+                break
+            response = self.client.get(reverse('polls:index'), {'cursor': response.context['next_cursor']})
+        self.assertEqual(texts, ["Poll 4.", "Poll 3.", "Poll 2.", "Poll 1.", "Poll 0."])
+
+    def test_invalid_cursor(self):
+        """A tampered cursor results in a 404."""
+        response = self.client.get(reverse('polls:index'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_status_filter(self):
+        """The status parameter lists only open or only closed polls."""
+        create_poll("Closed poll.", start=timezone.now() - datetime.timedelta(days=30),
+                    end=timezone.now() - datetime.timedelta(days=10))
+        create_poll("Open poll.", start=timezone.now() - datetime.timedelta(days=1),
+                    end=timezone.now() + datetime.timedelta(days=10))
+        response = self.client.get(reverse('polls:index'), {'status': 'open'})
+        self.assertEqual([poll.text for poll in response.context['latest_poll_list']], ["Open poll."])
+        response = self.client.get(reverse('polls:index'), {'status': 'closed'})
+        self.assertEqual([poll.text for poll in response.context['latest_poll_list']], ["Closed poll."])
+
 
 class QuestionDetailViewTests(TestCase):
     """Contain tests for the Detail view."""
@@ -144,3 +254,126 @@ class QuestionDetailViewTests(TestCase):
         url = reverse('polls:detail', args=(past_poll.id,))
         response = self.client.get(url)
         self.assertEqual(response.status_code, 302)
+
+    def test_open_poll_query_count(self):
+        """The detail page loads the poll, its choices and the user's vote in a bounded number of queries."""
+        user = User.objects.create_user(username="voter")
+        self.client.force_login(user)
+        poll = create_poll("Dummy 3", start=timezone.now() - datetime.timedelta(days=1),
+                           end=timezone.now() + datetime.timedelta(days=1))
+        choices = [poll.choice_set.create(text=f"Choice {i}") for i in range(10)]
+        Vote.objects.create(user=user, choice=choices[3])
+        # User (the session is cached), poll with its votability, choices and the user's vote.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('polls:detail', args=(poll.id,)))
+        self.assertEqual(response.context['user_vote'].choice_id, choices[3].id)
+        self.assertContains(response, f'value="{choices[3].id}" checked')
+
+    def test_choices_fragment_is_cached(self):
+        """Visits take the choices from the cached fragment whatever others vote, until the choices are edited."""
+        user = User.objects.create_user(username="voter")
+        self.client.force_login(user)
+        poll = create_poll("Dummy 4", start=timezone.now() - datetime.timedelta(days=1),
+                           end=timezone.now() + datetime.timedelta(days=1))
+        choice = poll.choice_set.create(text="Choice")
+        url = reverse('polls:detail', args=(poll.id,))
+        self.client.get(url)
+        votes_changed.send(sender=Vote, question_id=poll.id, deltas={choice.id: 1})
+        # User (the session is cached), poll with its votability and the user's vote.
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=(poll.id,)), {'choice': choice.id})
+        self.assertContains(self.client.get(url), f'value="{choice.id}" checked')
+        choice.text = "Renamed choice"
+        choice.save()
+        self.assertContains(self.client.get(url), "Renamed choice")
+
+    def test_missing_poll(self):
+        """The detail view of a poll that does not exist is a 404."""
+        self.client.force_login(User.objects.create_user(username="voter"))
+        response = self.client.get(reverse('polls:detail', args=(1234,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class QuestionResultsViewTests(TestCase):
+    """Contain tests for the Results view."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()  # Version tokens of rolled back polls would otherwise key fragments of reused ids.
+        self.poll = create_poll("Dummy 3", start=timezone.now() - datetime.timedelta(days=1),
+                                end=timezone.now() + datetime.timedelta(days=1))
+        self.url = reverse('polls:results', args=(self.poll.id,))
+
+    def test_results_tally(self):
+        """Each choice shows its vote total and share of all votes."""
+        choices = [self.poll.choice_set.create(text=f"Choice {i}") for i in range(4)]
+        for i in range(4):
+            user = User.objects.create_user(username=f"voter{i}")
+            Vote.objects.create(user=user, choice=choices[0] if i < 3 else choices[1])
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_votes'], 4)
+        self.assertEqual([c.num_votes for c in response.context['choices']], [3, 1, 0, 0])
+        self.assertContains(response, "75.0%")
+
+    def test_results_query_count_is_constant(self):
+        """The results page runs the same number of queries no matter how many choices a poll has."""
+        self.poll.choice_set.create(text="Only choice")
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        for i in range(20):
+            self.poll.choice_set.create(text=f"Choice {i}")
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_tally_fragment_is_cached(self):
+        """A second visit skips the tally query, until a vote changes the poll's version."""
+        choice = self.poll.choice_set.create(text="Only choice")
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.create(user=User.objects.create_user(username="voter"), choice=choice)
+            Choice.apply_vote_deltas({choice.id: 1})
+            votes_changed.send(sender=Vote, question_id=self.poll.id, deltas={choice.id: 1})
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertContains(response, "100.0%")
+
+    def test_closed_poll_validators(self):
+        """A closed poll's results carry validators and are revalidated with a 304."""
+        poll = create_poll("Closed", start=timezone.now() - datetime.timedelta(days=5),
+                           end=timezone.now() - datetime.timedelta(days=1))
+        url = reverse('polls:results', args=(poll.id,))
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(response['Last-Modified'], http_date(calendar.timegm(poll.end_date.utctimetuple())))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_closed_poll_page_is_cached(self):
+        """A closed poll's results page is rendered once and then served from the cache."""
+        poll = create_poll("Closed", start=timezone.now() - datetime.timedelta(days=5),
+                           end=timezone.now() - datetime.timedelta(days=1))
+        url = reverse('polls:results', args=(poll.id,))
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+
+
+class VersionCacheCheckTests(TestCase):
+    """Contain tests for the check of the cache holding the poll version tokens."""
+
+    def test_shared_between_workers(self):
+        """A process-local version cache is only an error once several worker processes serve the app."""
+        self.assertEqual(check_version_cache(None), [])
+        with self.settings(WEB_CONCURRENCY=4):
+            self.assertEqual([error.id for error in check_version_cache(None)], ['polls.E004'])
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/versions'}
+        caches = {**settings.CACHES, 'versions': shared}
+        with self.settings(WEB_CONCURRENCY=4, CACHES=caches):
+            self.assertEqual(check_version_cache(None), [])
+        with self.settings(CACHES={'default': settings.CACHES['default']}):
+            self.assertEqual([error.id for error in check_version_cache(None)], ['polls.E003'])
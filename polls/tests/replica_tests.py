@@ -0,0 +1,70 @@
+"""Tests for routing reads to a read replica."""
+
+import time
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from ..middleware import ReplicaRoutingMiddleware
+from ..models import Question
+from ..routers import STICKY_COOKIE, ReplicaRouter, use_primary
+from ..versions import reads_for, results_fragment_timeout
+
+
+@override_settings(POLLS_REPLICA={'ALIAS': 'replica', 'LAG': 5.0})
+class ReplicaRoutingTests(TestCase):
+    """Contain tests for choosing between the primary and the replica."""
+
+    def setUp(self):
+        super().setUp()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.read_from = None
+
+        def view(request):
+            self.read_from = self.router.db_for_read(Question)
+            return HttpResponse()
+
+        self.middleware = ReplicaRoutingMiddleware(view)
+
+    def test_router(self):
+        """Reads go to the replica unless pinned to the primary, writes always go to the primary."""
+        self.assertEqual(self.router.db_for_read(Question), 'replica')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Question), 'default')
+        self.assertEqual(self.router.db_for_write(Question), 'default')
+        with self.settings(POLLS_REPLICA={'ALIAS': None, 'LAG': 5.0}):
+            self.assertEqual(self.router.db_for_read(Question), 'default')
+
+    def test_reads_use_replica(self):
+        """A plain page view reads from the replica and sets no cookie."""
+        response = self.middleware(self.factory.get('/polls/'))
+        self.assertEqual(self.read_from, 'replica')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_writer_sticks_to_primary(self):
+        """A write is served from the primary, and so are the writer's next requests."""
+        response = self.middleware(self.factory.post('/polls/1/vote/'))
+        self.assertEqual(self.read_from, 'default')
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 5)
+        request = self.factory.get('/polls/1/results/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        self.middleware(request)
+        self.assertEqual(self.read_from, 'default')
+
+    def test_others_use_replica_after_a_write(self):
+        """Another client's write does not move anyone else's reads to the primary."""
+        self.middleware(self.factory.post('/polls/1/vote/'))
+        self.middleware(self.factory.get('/polls/1/results/'))
+        self.assertEqual(self.read_from, 'replica')
+
+    def test_fragments_outlive_no_lag(self):
+        """Results tables, which others may render from a lagging replica, are cached no longer than its lag."""
+        self.assertEqual(results_fragment_timeout(), 5)
+        with self.settings(POLLS_REPLICA={'ALIAS': None, 'LAG': 5.0}):
+            self.assertEqual(results_fragment_timeout(), 60 * 60)
+
+    def test_fresh_tokens_read_from_primary(self):
+        """Caches filled under a token younger than the lag are read from the primary, older ones from the replica."""
+        with reads_for(time.time_ns()):
+            self.assertEqual(self.router.db_for_read(Question), 'default')
+        with reads_for(time.time_ns() - 6 * 10 ** 9):
+            self.assertEqual(self.router.db_for_read(Question), 'replica')
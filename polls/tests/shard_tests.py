@@ -0,0 +1,103 @@
+"""Tests for the sharded vote counters."""
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Choice, ChoiceVoteShard, Question, Vote
+from ..voting import cast_vote
+from .fixtures import PollFixture
+
+
+@override_settings(POLLS_VOTE_COUNTER_SHARDS=4)
+class ShardedCounterTests(PollFixture, TestCase):
+    """Contain tests for counting votes in several counter rows per choice."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.users = [User.objects.create_user(username=f"voter{i}") for i in range(6)]
+
+    def totals(self):
+        return list(Choice.objects.with_vote_total().order_by('pk').values_list('vote_total', flat=True))
+
+    def test_votes_spread_over_shards(self):
+        """Votes land in the shard of their voter and the shards sum up to the tally, `Choice.votes` stays put."""
+        for user in self.users:
+            cast_vote(user, self.question.id, self.choices[1].id)
+        cast_vote(self.users[0], self.question.id, self.choices[0].id)
+        self.assertEqual(self.totals(), [1, 5])
+        self.assertEqual(list(Choice.objects.values_list('votes', flat=True)), [0, 0])
+        self.assertEqual(set(ChoiceVoteShard.objects.values_list('shard', flat=True)), {0, 1, 2, 3})
+
+    def test_existing_counter_is_kept(self):
+        """Shards add to whatever `Choice.votes` counted before sharding was turned on."""
+        Choice.objects.filter(pk=self.choices[0].pk).update(votes=3)
+        cast_vote(self.users[0], self.question.id, self.choices[0].id)
+        self.assertEqual(self.totals(), [4, 0])
+
+    def test_results_read_through_cache(self):
+        """Results are summed from the shards once and then served from the cache until it expires."""
+        cast_vote(self.users[0], self.question.id, self.choices[1].id)
+        question = Question.objects.get(pk=self.question.pk)
+        _, total = question.results()
+        self.assertEqual(total, 1)
+        cast_vote(self.users[1], self.question.id, self.choices[1].id)
+        with self.assertNumQueries(0):
+            choices, total = question.results()
+        self.assertEqual((total, [choice.num_votes for choice in choices]), (1, [0, 1]))
+        cache.delete(f"polls:question:{self.question.id}:counted-choices")
+        self.assertEqual(question.results()[1], 2)
+
+    def test_results_page_and_api(self):
+        """The results page and the API show the sharded totals."""
+        for user in self.users[:2]:
+            cast_vote(user, self.question.id, self.choices[0].id)
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response.context['total_votes'], 2)
+        response = self.client.get(reverse('polls:api_poll_results', args=(self.question.id,)))
+        self.assertEqual([choice['votes'] for choice in response.json()['polls'][0]['choices']], [2, 0])
+
+    def test_rebuild_folds_shards(self):
+        """Rebuilding the counters moves the shards' counts back into `Choice.votes`, drift is measured on totals."""
+        for user in self.users[:3]:
+            cast_vote(user, self.question.id, self.choices[0].id)
+        call_command('rebuild_vote_counts', '--check', stdout=StringIO())
+        ChoiceVoteShard.objects.update(votes=5)
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.assertFalse(ChoiceVoteShard.objects.exists())
+        self.assertEqual(list(Choice.objects.order_by('pk').values_list('votes', flat=True)), [3, 0])
+
+
+class ConcurrentShardTests(TransactionTestCase):
+    """Contain tests that count votes into shards from several threads at once."""
+
+    # The in-memory test database locks whole tables and fails at once rather than waiting, so allow more retries.
+    @override_settings(POLLS_VOTE_COUNTER_SHARDS=4,
+                       POLLS_LOCK_RETRY={'ATTEMPTS': 50, 'BACKOFF': 0.002, 'MAX_DELAY': 0.05})
+    def test_no_lost_votes(self):
+        """Votes racing to create the same shard rows are all counted."""
+        start = timezone.now() - datetime.timedelta(days=1)
+        question = Question.objects.create(text="Dummy", start_date=start,
+                                           end_date=start + datetime.timedelta(days=2))
+        choices = [question.choice_set.create(text=f"Choice {i}") for i in range(2)]
+        users = [User.objects.create_user(username=f"voter{i}") for i in range(8)]
+
+        def vote(user):
+            try:
+                for choice in choices * 3:
+                    cast_vote(user, question.id, choice.id)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            list(pool.map(vote, users))
+        self.assertEqual(Vote.objects.count(), len(users))
+        self.assertEqual(list(Choice.objects.with_vote_total().order_by('pk').values_list('vote_total', flat=True)),
+                         [0, len(users)])
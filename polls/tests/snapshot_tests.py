@@ -0,0 +1,84 @@
+"""Tests for the frozen results of closed polls."""
+
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .. import clock
+from ..models import PollResultSnapshot, Question, Vote
+
+
+@override_settings(POLLS_RESULT_SNAPSHOT_DELAY=60)
+class PollResultSnapshotTests(TestCase):
+    """Contain tests for taking and serving result snapshots."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        now = timezone.now()
+        self.question = Question.objects.create(text="Closed poll", start_date=now - datetime.timedelta(days=10),
+                                                end_date=now - datetime.timedelta(days=5))
+        self.choice1 = self.question.choice_set.create(text="Choice 1")
+        self.choice2 = self.question.choice_set.create(text="Choice 2")
+        for i, choice in enumerate([self.choice1, self.choice1, self.choice2]):
+            Vote.objects.create(user=User.objects.create_user(username=f"voter{i}"), choice=choice)
+
+    def test_taken_on_first_read(self):
+        """The first read of a closed poll's results freezes them, later reads do not count the votes."""
+        choices, total = self.question.results()
+        self.assertEqual(([c.num_votes for c in choices], total), ([2, 1], 3))
+        self.assertEqual(PollResultSnapshot.objects.get().tally, {str(self.choice1.id): 2, str(self.choice2.id): 1})
+        Vote.objects.filter(choice=self.choice2).delete()
+        # The snapshot and the choices.
+        with self.assertNumQueries(2):
+            choices, total = self.question.results()
+        self.assertEqual(([c.num_votes for c in choices], total), ([2, 1], 3))
+
+    def test_not_taken_while_settling(self):
+        """A poll that closed moments ago is still counted live, queued votes may be on their way."""
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(seconds=5))
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.results()[1], 3)
+        self.assertFalse(PollResultSnapshot.objects.exists())
+
+    def test_open_poll_has_no_snapshot(self):
+        """The results of an open poll are always counted."""
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() + datetime.timedelta(days=1))
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.results()[1], 3)
+        self.assertFalse(PollResultSnapshot.objects.exists())
+
+    def test_retaken_after_reopening(self):
+        """A poll reopened after its snapshot was taken is counted again, votes included, once it closes again."""
+        self.question.results()
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() + datetime.timedelta(days=1))
+        self.question.refresh_from_db()
+        Vote.objects.create(user=User.objects.create_user(username="late"), choice=self.choice2)
+        with clock.pinned(timezone.now() + datetime.timedelta(days=2)):
+            self.assertEqual(self.question.results()[1], 4)
+        self.assertEqual(PollResultSnapshot.objects.get().total_votes, 4)
+
+    def test_results_page(self):
+        """The results page of a closed poll is served from its snapshot."""
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response.context['total_votes'], 3)
+        self.assertTrue(PollResultSnapshot.objects.filter(question=self.question).exists())
+
+    def test_command_compacts_votes(self):
+        """The command snapshots closed polls, then archives and deletes old votes without losing the totals."""
+        with tempfile.TemporaryDirectory() as directory:
+            archive = os.path.join(directory, "votes.jsonl")
+            call_command('snapshot_results', '--compact-older-than', '1', '--archive', archive, stdout=StringIO())
+            with open(archive) as lines:
+                self.assertEqual(len([json.loads(line) for line in lines]), 3)
+        self.assertFalse(Vote.objects.exists())
+        self.assertTrue(PollResultSnapshot.objects.get().votes_compacted)
+        self.assertEqual(self.question.results()[1], 3)
+        call_command('rebuild_vote_counts', '--check', stdout=StringIO())
@@ -0,0 +1,117 @@
+"""Tests for the static files pipeline."""
+
+import gzip
+import os
+import tempfile
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from ..checks import check_static_references
+from ..middleware import StaticFilesMiddleware
+
+
+class StaticReferenceCheckTests(SimpleTestCase):
+    """Contain tests for the check of the static files templates and stylesheets refer to."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(content)
+
+    def test_shipped_files(self):
+        """The app's own templates and stylesheets refer to existing files only."""
+        self.assertEqual(check_static_references(None), [])
+
+    def test_missing_template_reference(self):
+        """A `{% static %}` tag naming a missing file is an error."""
+        self.write('page.html', "{% load static %}<link href=\"{% static 'polls/index.css' %}\">"
+                                "<script src=\"{% static 'polls/missing.js' %}\"></script>")
+        with self.settings(TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                                       'DIRS': [self.directory]}]):
+            errors = check_static_references(None)
+        self.assertEqual([error.id for error in errors], ['polls.E001'])
+        self.assertIn("'polls/missing.js'", errors[0].msg)
+
+    def test_missing_stylesheet_reference(self):
+        """A relative `url()` of a stylesheet naming a missing file is an error, external ones are not checked."""
+        self.write('extra/site.css', 'a { background: url("../img/dot.png"); } b { background: url(logo.svg?v=2) }\n'
+                                     'i { background: url(data:image/gif;base64,R0lG) url("https://example.com/x") }')
+        self.write('img/dot.png', "")
+        with self.settings(STATICFILES_DIRS=[self.directory]):
+            errors = check_static_references(None)
+        self.assertEqual([error.id for error in errors], ['polls.E002'])
+        self.assertIn("'extra/logo.svg'", errors[0].msg)
+
+
+class CollectedStaticTests(SimpleTestCase):
+    """Contain tests for collecting the static files and serving them from the app."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        settings = self.settings(STATIC_ROOT=self.root, POLLS_STATIC={'SERVE': True, 'MAX_AGE': 60})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = staticfiles_storage.stored_name('polls/index.css')
+        self.factory = RequestFactory()
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+
+    def test_hashed_and_compressed(self):
+        """Files are collected under a content-hashed name, with a gzip variant holding the same content."""
+        self.assertRegex(self.hashed, r'^polls/index\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, self.hashed), 'rb') as file, \
+                gzip.open(os.path.join(self.root, self.hashed + '.gz')) as compressed:
+            self.assertEqual(compressed.read(), file.read())
+
+    def test_serve_hashed(self):
+        """A hashed name is served as immutable for a year, compressed for clients that accept it."""
+        response = self.middleware(self.factory.get('/static/' + self.hashed, HTTP_ACCEPT_ENCODING='gzip, br;q=0'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual((response['Content-Encoding'], response['Content-Type']), ('gzip', 'text/css'))
+        self.assertIn(b'background', gzip.decompress(b''.join(response.streaming_content)))
+        response = self.middleware(self.factory.get('/static/' + self.hashed))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_refused_encodings(self):
+        """An encoding the client gives a q value of 0 is never sent, a wildcard accepts the ones not listed."""
+        with open(os.path.join(self.root, self.hashed + '.br'), 'wb') as file:
+            file.write(b'brotli')
+        middleware = StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+        for accept, encoding in (('gzip, br;q=0', 'gzip'), ('br;q=0.5, gzip', 'br'), ('*', 'br'),
+                                 ('br; q=0, *;q=0.1', 'gzip'), ('gzip;q=0, br;q=0', None)):
+            response = middleware(self.factory.get('/static/' + self.hashed, HTTP_ACCEPT_ENCODING=accept))
+            self.assertEqual(response.get('Content-Encoding'), encoding, accept)
+
+    def test_serve_unhashed(self):
+        """An unhashed name is cached briefly and revalidated with its modification time."""
+        response = self.middleware(self.factory.get('/static/polls/index.css'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        response = self.middleware(self.factory.get('/static/polls/index.css',
+                                                    HTTP_IF_MODIFIED_SINCE=response['Last-Modified']))
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_requests_pass_through(self):
+        """Requests for anything but a collected file reach the app."""
+        self.assertEqual(self.middleware(self.factory.get('/static/polls/missing.css')).status_code, 404)
+        self.assertEqual(self.middleware(self.factory.post('/static/' + self.hashed)).status_code, 404)
+
+    async def test_serve_async(self):
+        """Under ASGI the file is served whole."""
+        async def get_response(request):
+            return HttpResponse(status=404)
+
+        response = await StaticFilesMiddleware(get_response)(self.factory.get('/static/' + self.hashed))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn(b'background', response.content)
@@ -0,0 +1,81 @@
+"""Tests for the live results stream and the tally pub/sub feeding it."""
+
+import json
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import NoReverseMatch, reverse
+from ..pubsub import TallyBroker, broker
+from ..voting import cast_vote
+from .fixtures import PollFixture
+
+
+class TallyBrokerTests(TestCase):
+    """Contain tests for publishing tally changes."""
+
+    def test_changes_coalesce(self):
+        """Changes published between two takes are merged into one update."""
+        tallies = TallyBroker()
+        subscription = tallies.subscribe(1)
+        tallies.publish(1, {10: 1})
+        tallies.publish(1, {10: 1, 11: 1})
+        tallies.publish(1, {11: -1, 12: 1})
+        tallies.publish(2, {20: 1})
+        self.assertEqual(subscription.take(), {10: 2, 12: 1})
+        self.assertEqual(subscription.take(), {})
+
+    def test_unsubscribe(self):
+        """An unsubscribed listener receives nothing more."""
+        tallies = TallyBroker()
+        subscription = tallies.subscribe(1)
+        tallies.unsubscribe(subscription)
+        tallies.publish(1, {10: 1})
+        self.assertEqual(subscription.take(), {})
+
+
+class ResultsStreamTests(PollFixture, TestCase):
+    """Contain tests for the live results stream."""
+
+    def test_vote_publishes_on_commit(self):
+        """A vote publishes its tally change once its transaction commits."""
+        subscription = broker.subscribe(self.question.id)
+        self.addCleanup(broker.unsubscribe, subscription)
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.user, self.question.id, self.choice1.id)
+            self.assertEqual(subscription.take(), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.user, self.question.id, self.choice2.id)
+        self.assertEqual(subscription.take(), {self.choice2.id: 1})
+
+    @override_settings(ROOT_URLCONF='polls.tests.async_urls',
+                       POLLS_RESULTS_STREAM={'INTERVAL': 0, 'HEARTBEAT': 60, 'MAX_AGE': 5})
+    async def test_stream(self):
+        """The stream opens with a snapshot and then sends the tally changes."""
+        await sync_to_async(cast_vote)(self.user, self.question.id, self.choice1.id)
+        response = await self.async_client.get(reverse('polls:results_stream', args=(self.question.id,)))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = response.streaming_content
+        self.assertEqual(await events.__anext__(), b"retry: 1000\n\n")
+        snapshot = (await events.__anext__()).decode()
+        self.assertTrue(snapshot.startswith("event: snapshot\n"))
+        self.assertEqual(json.loads(snapshot.split("data: ")[1])['choices'],
+                         {str(self.choice1.id): 1, str(self.choice2.id): 0})
+        broker.publish(self.question.id, {self.choice1.id: -1})
+        broker.publish(self.question.id, {self.choice2.id: 1})
+        tally = (await events.__anext__()).decode()
+        self.assertTrue(tally.startswith("event: tally\n"))
+        self.assertEqual(json.loads(tally.split("data: ")[1])['deltas'],
+                         {str(self.choice1.id): -1, str(self.choice2.id): 1})
+        await events.aclose()
+
+    @override_settings(ROOT_URLCONF='polls.tests.async_urls')
+    async def test_results_page_streams(self):
+        """With the async views the results page of an open poll listens to the stream."""
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, reverse('polls:results_stream', args=(self.question.id,)))
+
+    def test_no_stream_without_async_views(self):
+        """The sync views hold a worker thread per stream, so they neither serve it nor let the page listen."""
+        with self.assertRaises(NoReverseMatch):
+            reverse('polls:results_stream', args=(self.question.id,))
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertNotContains(response, "EventSource")
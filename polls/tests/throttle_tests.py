@@ -0,0 +1,129 @@
+"""Tests for the rate limiting of the vote and signup endpoints."""
+
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .. import throttling
+from .fixtures import PollFixture
+
+LIMITS = {
+    'ENABLED': True, 'CACHE': 'default', 'IP_HEADER': '',
+    'ENDPOINTS': {'vote': {'RATE': '1/second', 'BURST': 3}, 'signup': {'RATE': '1/minute', 'BURST': 2}},
+}
+
+
+@override_settings(POLLS_RATE_LIMITS=LIMITS)
+class TokenBucketTests(TestCase):
+    """Contain tests for taking tokens from a client's bucket."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(throttling.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def take(self, client="user:1", endpoint='vote'):
+        return throttling.take_token(endpoint, client)
+
+    def test_burst_then_refill(self):
+        """A bucket allows BURST requests at once, then one more per refill interval."""
+        self.assertEqual([self.take() for _ in range(4)], [0, 0, 0, 1.0])
+        self.now += 0.25
+        self.assertEqual(self.take(), 0.75)
+        self.now += 0.75
+        self.assertEqual([self.take(), self.take()], [0, 1.0])
+
+    def test_refused_requests_take_no_token(self):
+        """A client hammering an empty bucket still gets a token as soon as one refills."""
+        for _ in range(3):
+            self.take()
+        for _ in range(20):
+            self.take()
+        self.now += 1
+        self.assertEqual(self.take(), 0)
+
+    def test_idle_bucket_fills_up(self):
+        """A bucket idle for long enough holds BURST tokens again, never more."""
+        for _ in range(3):
+            self.take()
+        self.now += 3600
+        self.assertEqual([self.take() for _ in range(4)], [0, 0, 0, 1.0])
+
+    def test_buckets_per_client_and_endpoint(self):
+        """Clients and endpoints have buckets of their own."""
+        for _ in range(3):
+            self.take()
+        self.assertEqual((self.take("user:2"), self.take(endpoint='signup')), (0, 0))
+
+    def test_invalid_rate(self):
+        """A rate that is not a count per period is a configuration error."""
+        with self.assertRaises(ImproperlyConfigured):
+            throttling.token_interval('10/fortnight')
+
+
+@override_settings(POLLS_RATE_LIMITS=LIMITS)
+class RateLimitedViewTests(PollFixture, TestCase):
+    """Contain tests for the 429 answers of the vote and signup views."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_vote(self):
+        """A voter over the limit gets a 429 with Retry-After, other voters are not affected."""
+        self.client.force_login(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        statuses = [self.client.post(url, {'choice': self.choice1.id}).status_code for _ in range(4)]
+        self.assertEqual(statuses, [302, 302, 302, 429])
+        self.assertEqual(self.client.post(url, {'choice': self.choice1.id})['Retry-After'], '1')
+        self.client.force_login(User.objects.create_user(username="other"))
+        self.assertEqual(self.client.post(url, {'choice': self.choice1.id}).status_code, 302)
+
+    def test_signup(self):
+        """Signups are limited per IP address, the form itself is not."""
+        url = reverse('signup')
+        statuses = [self.client.post(url, {'username': f"new{i}", 'password1': "Fat-Chance!",
+                                           'password2': "Fat-Chance!"}, REMOTE_ADDR='10.0.0.1').status_code
+                    for i in range(3)]
+        self.assertEqual(statuses, [302, 302, 429])
+        self.assertEqual(User.objects.filter(username__startswith="new").count(), 2)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code, 200)
+        self.assertEqual(self.client.post(url, {}, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_ip_header(self):
+        """Behind a proxy, anonymous clients are told apart by the address the proxy passes on."""
+        url = reverse('signup')
+        with self.settings(POLLS_RATE_LIMITS={**LIMITS, 'IP_HEADER': 'X-Forwarded-For'}):
+            statuses = [self.client.post(url, {}, HTTP_X_FORWARDED_FOR=f"1.2.3.4, 10.0.0.{i % 2}").status_code
+                        for i in range(5)]
+        self.assertEqual(statuses, [200, 200, 200, 200, 429])
+
+    def test_disabled(self):
+        """No request is refused when rate limiting is off."""
+        self.client.force_login(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        with self.settings(POLLS_RATE_LIMITS={**LIMITS, 'ENABLED': False}):
+            statuses = {self.client.post(url, {'choice': self.choice1.id}).status_code for _ in range(5)}
+        self.assertEqual(statuses, {302})
+
+    @override_settings(ROOT_URLCONF='polls.tests.async_urls')
+    async def test_async_vote(self):
+        """The async vote view is limited the same way."""
+        await sync_to_async(self.async_client.force_login)(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        statuses = [(await self.async_client.post(url, {'choice': self.choice1.id})).status_code for _ in range(4)]
+        self.assertEqual(statuses, [302, 302, 302, 429])
+
+    @override_settings(ROOT_URLCONF='polls.tests.async_urls')
+    async def test_async_anonymous_vote(self):
+        """Anonymous voters are sent to log in before taking tokens, as with the sync vote view."""
+        url = reverse('polls:vote', args=(self.question.id,))
+        responses = [await self.async_client.post(url, {'choice': self.choice1.id}) for _ in range(5)]
+        self.assertEqual({response.status_code for response in responses}, {302})
+        self.assertTrue(all(reverse('login') in response['Location'] for response in responses))
@@ -0,0 +1,157 @@
+"""Tests for voting and the per-choice vote counters."""
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ..database import retry_on_lock
+from ..models import Choice, Question, Vote
+from ..voting import VotingClosed, cast_vote
+from .fixtures import PollFixture
+
+
+class VoteCounterTests(PollFixture, TestCase):
+    """Contain tests for keeping `Choice.votes` in step with the Vote table."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def cast(self, choice):
+        """Vote for `choice` as the logged in user."""
+        return self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id})
+
+    def test_new_vote_increments_counter(self):
+        """A first vote adds one to the selected choice."""
+        response = self.cast(self.choice1)
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_changed_vote_moves_counter(self):
+        """Changing a vote moves the count from the old choice to the new one."""
+        self.cast(self.choice1)
+        self.cast(self.choice2)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual((self.choice1.votes, self.choice2.votes), (0, 1))
+        self.assertEqual(Vote.objects.filter(user=self.user).count(), 1)
+
+    def test_repeated_vote_does_not_count_twice(self):
+        """Voting for the same choice again leaves the counter unchanged."""
+        self.cast(self.choice1)
+        self.cast(self.choice1)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_rebuild_command_fixes_drift(self):
+        """The rebuild command reports drifted counters and recomputes them."""
+        self.cast(self.choice1)
+        Choice.objects.filter(pk=self.choice1.pk).update(votes=7)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_vote_counts', '--check', stdout=StringIO())
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+        call_command('rebuild_vote_counts', '--check', stdout=StringIO())
+
+    def test_one_vote_per_user_and_question(self):
+        """The database refuses a second vote by the same user on the same poll."""
+        self.cast(self.choice1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.user, choice=self.choice2)
+
+    def test_closed_poll_refuses_votes(self):
+        """A vote on a poll that has closed is turned away without being recorded."""
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(hours=1))
+        response = self.cast(self.choice1)
+        self.assertRedirects(response, reverse('polls:index', args=('error',)))
+        self.assertFalse(Vote.objects.exists())
+        with self.assertRaises(VotingClosed):
+            cast_vote(self.user, self.question.id, self.choice1.id)
+
+    def test_vote_question_filled_from_choice(self):
+        """A vote saved without a question takes it from its choice."""
+        vote = Vote.objects.create(user=self.user, choice=self.choice2)
+        self.assertEqual(vote.question_id, self.question.id)
+
+
+class CastVoteTests(PollFixture, TestCase):
+    """Contain tests for the vote upsert."""
+
+    def statements(self, *args):
+        """Cast a vote and return its result with the SQL statements it ran, savepoints excluded."""
+        with CaptureQueriesContext(connection) as queries:
+            result = cast_vote(self.user, *args)
+        return result, [q['sql'] for q in queries if 'SAVEPOINT' not in q['sql']]
+
+    def test_new_vote_round_trips(self):
+        """
+        A first vote is one read of the choice, one locked read of the old vote, an insert and a counter update.
+
+        Plus the insert and update of its rollups.
+        """
+        deltas, statements = self.statements(self.question.id, self.choice1.id)
+        self.assertEqual(deltas, {self.choice1.id: 1})
+        self.assertEqual(len(statements), 6)
+
+    def test_changed_vote_round_trips(self):
+        """Changing a vote updates the vote row, both counters and both choices' rollups in one statement each."""
+        cast_vote(self.user, self.question.id, self.choice1.id)
+        deltas, statements = self.statements(self.question.id, self.choice2.id)
+        self.assertEqual(deltas, {self.choice1.id: -1, self.choice2.id: 1})
+        self.assertEqual(len(statements), 6)
+        self.assertEqual(list(Choice.objects.order_by('pk').values_list('votes', flat=True)), [0, 1])
+
+    def test_choice_of_another_poll(self):
+        """A choice that does not belong to the poll is rejected without writing anything."""
+        other = Question.objects.create(text="Other", start_date=self.question.start_date,
+                                        end_date=self.question.end_date)
+        with self.assertRaises(Choice.DoesNotExist):
+            cast_vote(self.user, other.id, self.choice1.id)
+        self.assertFalse(Vote.objects.exists())
+
+
+class ConcurrentVoteTests(PollFixture, TransactionTestCase):
+    """Contain tests that cast votes from several threads, each with its own database connection."""
+
+    def setUp(self):
+        super().setUp()
+        self.users = [User.objects.create_user(username=f"voter{i}") for i in range(8)]
+
+    # The in-memory test database locks whole tables and fails at once rather than waiting, so allow more retries.
+    @override_settings(POLLS_LOCK_RETRY={'ATTEMPTS': 50, 'BACKOFF': 0.002, 'MAX_DELAY': 0.05})
+    def test_no_lost_votes(self):
+        """Every vote and change of vote cast at the same time is counted, retrying writers that lose the lock."""
+        def vote(user):
+            try:
+                for choice in self.choices * 5:
+                    cast_vote(user, self.question.id, choice.id)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=len(self.users)) as pool:
+            list(pool.map(vote, self.users))
+        self.assertEqual(Vote.objects.count(), len(self.users))
+        self.assertEqual(list(Choice.objects.order_by('pk').values_list('votes', flat=True)), [0, len(self.users)])
+
+    def test_retry_gives_up(self):
+        """A writer that keeps losing the lock gives up after the configured attempts."""
+        attempts = []
+
+        @retry_on_lock
+        def locked():
+            attempts.append(1)
+            raise OperationalError("database is locked")
+
+        with override_settings(POLLS_LOCK_RETRY={'ATTEMPTS': 3, 'BACKOFF': 0, 'MAX_DELAY': 0}):
+            with self.assertRaises(OperationalError):
+                locked()
+        self.assertEqual(len(attempts), 3)
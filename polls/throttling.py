@@ -0,0 +1,123 @@
+"""
+Token bucket rate limiting of the endpoints that write, per client and endpoint.
+
+A client is a logged in user, or the IP address of an anonymous visitor. Each bucket holds up to `BURST` tokens,
+refilled at `RATE`, and a request that finds it empty is refused with a `429 Too Many Requests` saying when to
+retry. Buckets live in a cache as the moment they will be full again (the generic cell rate algorithm), so taking a
+token is an atomic increment of that moment rather than a read followed by a write that concurrent requests could
+interleave. Limits are configured by `POLLS_RATE_LIMITS`.
+"""
+
+import functools
+import logging
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 60 * 60, 'day': 24 * 60 * 60}
+
+
+@functools.lru_cache
+def token_interval(rate):
+    """Return the milliseconds a rate such as '30/minute' takes to refill one token."""
+    count, _, period = rate.partition('/')
+    try:
+        return max(1, round(PERIODS[period] * 1000 / int(count)))
+    except (KeyError, ValueError, ZeroDivisionError):
+        raise ImproperlyConfigured(f"Invalid rate {rate!r}, expected a count per {', '.join(PERIODS)}.")
+
+
+def client_of(request, by_ip=False):
+    """Return who sent the request: the user if logged in and not `by_ip`, else the IP address."""
+    user = None if by_ip else getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    header = settings.POLLS_RATE_LIMITS['IP_HEADER']
+    if header and request.headers.get(header):
+        return f"ip:{request.headers[header].split(',')[-1].strip()}"  # The address the trusted proxy saw
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def take_token(endpoint, client):
+    """
+    Take a token from the bucket of `client` for `endpoint`.
+
+    Returns:
+        0 if a token was taken, else the seconds until one will be available. Refused requests take no token.
+    """
+    options = settings.POLLS_RATE_LIMITS
+    limit = options['ENDPOINTS'][endpoint]
+    interval = token_interval(limit['RATE'])
+    capacity = limit['BURST'] * interval
+    cache = caches[options['CACHE']]
+    key = f"polls:rate-limit:{endpoint}:{client}"
+    timeout = math.ceil(capacity / 1000) + 1
+    now = int(time.time() * 1000)
+
+    if cache.add(key, now + interval, timeout):
+        return 0
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:  # Expired since the add
+        full_at = now
+    if full_at < now + interval:
+        # The bucket was full. Concurrent requests may each restart it, taking one token between them.
+        cache.set(key, now + interval, timeout)
+        return 0
+    if full_at - now > capacity:
+        cache.decr(key, interval)
+        return (full_at - capacity - now) / 1000
+    cache.touch(key, timeout)
+    return 0
+
+
+def _limited(request):
+    return settings.POLLS_RATE_LIMITS['ENABLED'] and request.method not in ('GET', 'HEAD', 'OPTIONS')
+
+
+def _throttle(request, endpoint, by_ip):
+    """Take a token for the request, returning the 429 response to send if there is none."""
+    client = client_of(request, by_ip)
+    wait = take_token(endpoint, client)
+    if not wait:
+        return None
+    logger.info("Rate limited %s on %s for %.1fs", client, endpoint, wait)
+    response = HttpResponse("Too many requests, please try again later.", status=429, content_type='text/plain')
+    response['Retry-After'] = max(1, math.ceil(wait))
+    return response
+
+
+def rate_limit(endpoint, by_ip=False):
+    """
+    Refuse, with a 429 and a `Retry-After` header, the writes of a client that used up its tokens for `endpoint`.
+
+    Reads are never limited. `endpoint` names an entry of `POLLS_RATE_LIMITS['ENDPOINTS']`. With `by_ip`, clients
+    are told apart by IP address even once logged in, for endpoints such as signup that log a new user in.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if _limited(request):
+                    # Finding the user may read the session and the database, which are sync.
+                    refused = await sync_to_async(_throttle)(request, endpoint, by_ip)
+                    if refused is not None:
+                        return refused
+                return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if _limited(request):
+                    refused = _throttle(request, endpoint, by_ip)
+                    if refused is not None:
+                        return refused
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
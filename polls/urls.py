@@ -1,14 +1,37 @@
 """KU Poll's url patterns."""
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
 from django.contrib.auth.decorators import login_required
 
+
+def build_urlpatterns(use_async_views):
+    """
+    Return the app's url patterns, routing the index, results and vote to the async views.
+
+    The live results stream is only routed with the async views, the results page only links to it then.
+    """
+    if use_async_views:
+        index, results, vote = async_views.index, async_views.results, async_views.vote
+        live = [path('<int:pk>/results/stream/', async_views.results_stream, name='results_stream')]
+    else:
+        index, results, vote = views.index, views.ResultsView.as_view(), login_required(views.vote)
+        live = []
+    return [
+        path('', index, name='index'),
+        path('<str:error_message>', index, name='index'),
+        path('<int:pk>/', login_required(views.DetailView.as_view()), name='detail'),
+        path('<int:pk>/results/', results, name='results'),
+        path('<int:question_id>/vote/', vote, name='vote'),
+        path('metrics/', views.metrics, name='metrics'),
+        path('api/polls/', api.poll_list, name='api_poll_list'),
+        path('api/polls/<int:pk>/results/', api.poll_results, name='api_poll_results'),
+        path('api/polls/<int:pk>/votes/', api.poll_votes, name='api_poll_votes'),
+        path('api/results/', api.results_batch, name='api_results'),
+        *live,
+    ]
+
+
 app_name = 'polls'  # Namespacing the urls
-urlpatterns = [
-    path('', views.index, name='index'),
-    path('<str:error_message>', views.index, name='index'),
-    path('<int:pk>/', login_required(views.DetailView.as_view()), name='detail'),
-    path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', views.vote, name='vote')
-]
+urlpatterns = build_urlpatterns(settings.POLLS_ASYNC_VIEWS)
@@ -0,0 +1,117 @@
+"""
+Per-poll version tokens for cached renderings.
+
+A poll's vote token changes whenever anything shown on its results does: a vote, or an edit of the poll or its
+choices. Its edit token only changes on edits, for renderings that do not show votes. Cache keys and ETags that
+include a token go stale on their own, without having to find and delete them.
+
+Tokens live in the `versions` cache, which every worker process must share: a worker that does not see another's
+bump keeps serving what it cached before.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from .routers import use_primary
+
+VERSION_CACHE = 'versions'
+
+
+def _key(question_id, kind='version'):
+    return f"polls:question:{question_id}:{kind}"
+
+
+def vote_version(question_id):
+    """Return the current vote token of a poll."""
+    version = caches[VERSION_CACHE].get(_key(question_id))
+    if version is None:
+        version = bump_vote_version(question_id)
+    return version
+
+
+def vote_versions(question_ids):
+    """Return {question id: vote token} for many polls with a single cache round trip."""
+    cache = caches[VERSION_CACHE]
+    keys = {_key(question_id): question_id for question_id in question_ids}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    missing = {key: time.time_ns() for key, question_id in keys.items() if question_id not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update({keys[key]: version for key, version in missing.items()})
+    return versions
+
+
+async def avote_version(question_id):
+    """Async version of `vote_version`."""
+    cache = caches[VERSION_CACHE]
+    version = await cache.aget(_key(question_id))
+    if version is None:
+        version = time.time_ns()
+        await cache.aset(_key(question_id), version, None)
+    return version
+
+
+def bump_vote_version(question_id):
+    """Move a poll to a new vote token, returning it."""
+    version = time.time_ns()
+    caches[VERSION_CACHE].set(_key(question_id), version, None)
+    return version
+
+
+def edit_version(question_id):
+    """Return the current edit token of a poll."""
+    version = caches[VERSION_CACHE].get(_key(question_id, 'edit-version'))
+    if version is None:
+        version = bump_edit_version(question_id)
+    return version
+
+
+async def aedit_version(question_id):
+    """Async version of `edit_version`."""
+    cache = caches[VERSION_CACHE]
+    version = await cache.aget(_key(question_id, 'edit-version'))
+    if version is None:
+        version = time.time_ns()
+        await cache.aset(_key(question_id, 'edit-version'), version, None)
+    return version
+
+
+def bump_edit_version(question_id):
+    """Move a poll to new edit and vote tokens, returning the edit token."""
+    version = time.time_ns()
+    caches[VERSION_CACHE].set_many({_key(question_id): version, _key(question_id, 'edit-version'): version}, None)
+    return version
+
+
+@contextmanager
+def reads_for(version):
+    """
+    Route the reads of the block to the primary while the change a version token stands for may not be replicated.
+
+    Tokens are the time of the change in nanoseconds. Caches filled under one younger than `POLLS_REPLICA['LAG']`
+    are rendered from the primary, so they never keep the replica's data from before the change under its token.
+    """
+    if settings.POLLS_REPLICA['ALIAS'] and time.time_ns() - version < settings.POLLS_REPLICA['LAG'] * 10 ** 9:
+        with use_primary():
+            yield
+    else:
+        yield
+
+
+def results_fragment_timeout():
+    """
+    Return the seconds a rendered results table may be cached.
+
+    Sharded vote counters are read through a cache that can lag behind the poll's version by its timeout, and a
+    read replica can lag behind it by `POLLS_REPLICA['LAG']`, so a table rendered from either must not outlive
+    that lag.
+    """
+    timeout = 60 * 60
+    if settings.POLLS_VOTE_COUNTER_SHARDS > 1:
+        timeout = min(timeout, settings.POLLS_VOTE_COUNTER_CACHE_TIMEOUT)
+    if settings.POLLS_REPLICA['ALIAS']:
+        timeout = min(timeout, math.ceil(settings.POLLS_REPLICA['LAG']))
+    return timeout
@@ -1,85 +1,166 @@
 """KU Poll's views."""
 
-from django.http import HttpResponseRedirect
+import calendar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import redirect, render, get_object_or_404
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date, quote_etag
 from django.views import generic
+from . import instrumentation
+from .listing import get_poll_page
 from .models import *
+from .throttling import rate_limit
+from .versions import edit_version, reads_for, results_fragment_timeout, vote_version
+from .voting import VotingClosed, cast_vote, queue_vote
 
 
 def index(request, error_message=''):
     """
     Landing page of the website.
 
-    This page displays all available polls. User can select a poll of their choice to vote.
+    This page displays all available polls a page at a time. User can select a poll of their choice to vote.
+    The `status` query parameter narrows the list to open or closed polls, `cursor` selects the next page.
     """
-    latest_poll_list = Question.objects.filter(start_date__lte=timezone.now()).order_by('-start_date')
-    context = {'latest_poll_list': latest_poll_list, "error_message": error_message}
+    status = request.GET.get('status', '')
+    latest_poll_list, next_cursor = get_poll_page(status, request.GET.get('cursor', ''))
+    context = {'latest_poll_list': latest_poll_list, 'next_cursor': next_cursor, 'status': status,
+               "error_message": error_message}
     return render(request, 'polls/index.html', context)
 
 
 class DetailView(generic.DetailView):
     """The detail page enables users to vote on the given choices."""
 
+    template_name = 'polls/detail.html'
+
     def get_queryset(self):
-        """Get poll that matches the provided ID."""
-        return Question.objects.filter(pk=self.kwargs['pk'])
+        """
+        Get polls together with whether they accept votes and the user's existing vote.
+
+        The poll and its votability come from one query, the user's vote from a prefetch. The choices are only
+        loaded by the template when its cached fragment for the poll's current version is missing.
+        """
+        user_votes = Vote.objects.filter(user=self.request.user)
+        return Question.objects.with_is_open().prefetch_related(
+            Prefetch('vote_set', queryset=user_votes, to_attr='user_votes'),
+        )
 
     def get(self, request, *args, **kwargs):
         """Redirects to the index page if a visitor tries to access a poll that is not available for voting."""
-        super().get(self, request, *args, **kwargs)
-        if not self.get_object().can_vote():
+        self.object = self.get_object()
+        if not self.object.is_open:
             return redirect('polls:index', 'error')
-        return render(request, 'polls/detail.html', self.get_context_data())
+        context = self.get_context_data(object=self.object)
+        with reads_for(context['edit_version']):  # The choices of a missing fragment are read while rendering
+            return self.render_to_response(context).render()
 
+    def get_context_data(self, **kwargs):
+        """Add the user's existing vote, so the form can preselect it, and the version keying the cached fragment."""
+        context = super().get_context_data(**kwargs)
+        context['user_vote'] = self.object.user_votes[0] if self.object.user_votes else None
+        context['edit_version'] = edit_version(self.object.id)
+        return context
 
-class ResultsView(generic.DetailView):
-    """The result page displays the result of a poll."""
 
-    template_name = 'polls/results.html'
-    model = Question
+def results_context(question, version):
+    """Return the tallies of a poll's results page, computed on first use, and the version keying its fragment."""
+    results = SimpleLazyObject(question.results)
+    return {'choices': SimpleLazyObject(lambda: results[0]), 'total_votes': SimpleLazyObject(lambda: results[1]),
+            'vote_version': version, 'results_cache_timeout': results_fragment_timeout()}
 
 
-def vote(request, question_id):
-    """
-    In charge of adding vote count and detecting whether any answer has been selected or not.
+def closed_results_validators(question, version):
+    """Return the ETag and Last-Modified timestamp of a closed poll's results page."""
+    return quote_etag(f"{question.id}-{version}"), calendar.timegm(question.end_date.utctimetuple())
 
-    If no answer is selected it redirects the user to the details page along with an error message.
+
+def closed_results_key(question, version):
+    """Return the cache key of a closed poll's whole results page."""
+    return f"polls:results-page:{question.id}:{version}"
+
+
+def closed_results_headers(response, etag, last_modified):
+    """Add the validators and the public caching of a closed poll's results page to `response`."""
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=settings.POLLS_CLOSED_RESULTS_MAX_AGE)
+    return response
+
+
+class ResultsView(generic.DetailView):
     """
-    question = get_object_or_404(Question, pk=question_id)
-    try:
-        selected_choice = question.choice_set.get(pk=request.POST['choice'])
-    except (KeyError, Choice.DoesNotExist):
-        return render(request, 'polls/detail.html', {
-            'question': question,
-            'error_message': "You didn't select a choice.",
-        })
-    else:
-        user = request.user
-        user_vote = get_vote_for_user(user, question)
-
-        if user_vote is None:
-            # Create new vote.
-            user_vote = Vote.objects.create(user=user, choice=selected_choice)
-        else:
-            # Modify existing vote.
-            user_vote.choice = selected_choice
-        user_vote.save()
+    The result page displays the result of a poll.
 
-        return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+    The tally is only computed when the template's cached fragment for the poll's current version is missing.
+    Closed polls can no longer change, so their whole page is cached and answered with ETag/Last-Modified
+    validators, letting browsers revalidate with a `304 Not Modified`.
+    """
 
+    template_name = 'polls/results.html'
+    model = Question
 
-def get_vote_for_user(user, question):
+    def get(self, request, *args, **kwargs):
+        """Serve closed polls from the full-page cache, others through the fragment-cached template."""
+        self.object = self.get_object()
+        if self.object.status() != Question.CLOSED:
+            return self.render_to_response(self.get_context_data(object=self.object))
+
+        version = vote_version(self.object.id)
+        etag, last_modified = closed_results_validators(self.object, version)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            key = closed_results_key(self.object, version)
+            content = cache.get(key)
+            if content is None:
+                with reads_for(version):
+                    response = self.render_to_response(self.get_context_data(object=self.object)).render()
+                cache.set(key, response.content, settings.POLLS_CLOSED_RESULTS_CACHE_TIMEOUT)
+            else:
+                response = HttpResponse(content)
+        return closed_results_headers(response, etag, last_modified)
+
+    def get_context_data(self, **kwargs):
+        """Add the per-choice tallies, computed on first use, and the version keying the cached fragment."""
+        context = super().get_context_data(**kwargs)
+        context.update(results_context(self.object, vote_version(self.object.id)))
+        return context
+
+
+@rate_limit('vote')
+def vote(request, question_id):
     """
-    Find and return an existing vote for a user on a poll question.
+    In charge of recording the user's vote and detecting whether any answer has been selected or not.
 
-    Returns:
-        The user's vote or None if there are no votes for this question.
+    If no answer is selected it redirects the user to the details page along with an error message.
+    Votes on a poll that is not open are turned away to the index page, like visits to its details page.
     """
     try:
-        votes = Vote.objects.filter(user=user).filter(choice__question=question)
-        if votes.count() == 0:
-            return None
-        return votes[0]
-    except Vote.DoesNotExist:
-        return None
+        if settings.POLLS_VOTE_INGESTION == 'queued':
+            queue_vote(request.user, question_id, request.POST['choice'])
+        else:
+            cast_vote(request.user, question_id, request.POST['choice'])
+    except VotingClosed:
+        return redirect('polls:index', 'error')
+    except (KeyError, ValueError, Choice.DoesNotExist):
+        question = get_object_or_404(Question, pk=question_id)
+        version = edit_version(question.id)
+        with reads_for(version):
+            return render(request, 'polls/detail.html', {
+                'question': question,
+                'edit_version': version,
+                'error_message': "You didn't select a choice.",
+            })
+    return HttpResponseRedirect(reverse('polls:results', args=(question_id,)))
+
+
+def metrics(request):
+    """Expose the per-view request metrics in the Prometheus text format, if `METRICS_ENDPOINT` is enabled."""
+    if not settings.POLLS_INSTRUMENTATION['METRICS_ENDPOINT']:
+        raise Http404("The metrics endpoint is disabled.")
+    return HttpResponse(instrumentation.metrics.prometheus(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,67 @@
+"""Recording votes."""
+
+from django.db import IntegrityError, transaction
+from .database import retry_on_lock
+from .ingest import get_vote_queue
+from .models import Choice, Vote, VoteRollup
+from .signals import votes_changed
+
+
+class VotingClosed(Exception):
+    """Raised when voting on a poll that is not open."""
+
+
+@retry_on_lock
+def cast_vote(user, question_id, choice_id):
+    """
+    Record `user`'s vote for a choice of a poll, replacing any vote they already made on it.
+
+    The choice is looked up together with its poll, so a choice belonging to another poll, or a poll that is not
+    open, is rejected by the same query that loads it. The user's existing vote row is locked while it is replaced,
+    and a concurrent first vote that wins the race on the unique (user, question) constraint turns this one into a
+    change of vote. A transaction that loses the race for the database's write lock is retried.
+
+    Returns:
+        A {choice id: change} mapping of how the vote moved the tallies, empty if the vote did not change.
+
+    Raises:
+        Choice.DoesNotExist: If the choice does not exist or is not part of the poll.
+        VotingClosed: If the poll is not open.
+    """
+    choice = Choice.objects.select_related('question').get(pk=choice_id, question_id=question_id)
+    if not choice.question.can_vote():
+        raise VotingClosed(choice.question_id)
+    with transaction.atomic():
+        votes = Vote.objects.select_for_update().filter(user=user, question_id=question_id)
+        previous = votes.values_list('choice_id', flat=True).first()
+        if previous is None:
+            try:
+                with transaction.atomic():
+                    Vote.objects.create(user=user, question=choice.question, choice=choice)
+            except IntegrityError:
+                previous = votes.values_list('choice_id', flat=True).get()
+            else:
+                deltas = {choice.id: 1}
+        if previous is not None:
+            if previous == choice.id:
+                return {}
+            votes.update(choice=choice)
+            deltas = {previous: -1, choice.id: 1}
+        Choice.apply_vote_deltas(deltas, shard_key=user.pk)
+        VoteRollup.add(choice.question_id, deltas, shard_key=user.pk)
+        transaction.on_commit(lambda: votes_changed.send(sender=Vote, question_id=choice.question_id, deltas=deltas))
+    return deltas
+
+
+def queue_vote(user, question_id, choice_id):
+    """
+    Validate a ballot and hand it to the write-behind queue, it is written on the queue's next flush.
+
+    Raises:
+        Choice.DoesNotExist: If the choice does not exist or is not part of the poll.
+        VotingClosed: If the poll is not open.
+    """
+    choice = Choice.objects.select_related('question').get(pk=choice_id, question_id=question_id)
+    if not choice.question.can_vote():
+        raise VotingClosed(choice.question_id)
+    get_vote_queue().submit(user.pk, choice.question_id, choice.id)